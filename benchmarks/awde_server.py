@@ -0,0 +1,334 @@
+"""
+A local HTTP server that answers like the AWDE API, for testing and tuning
+ingestion offline. Point the app at it with the AWDE_URL environment variable.
+
+It serves the parliament-periods, polls and votes endpoints with AWDE's
+meta.result paging, from one of these sources:
+
+- a SyntheticAWDE (see synthetic.py),
+- a Recording: responses recorded earlier, replayed as they were,
+- a RecordingProxy: forwards to the real AWDE and records what it answers,
+
+answers conditional requests (If-None-Match) with 304 if nothing changed,
+and can add latency, server errors and a rate limit (429 with Retry-After) on
+top, so that retries and throttling can be tested reproducibly:
+
+    python -m benchmarks.awde_server --record recordings/
+    python -m benchmarks.awde_server --replay recordings/ --latency 0.2 \\
+        --error-rate 0.05 --rate-limit 10
+
+and then run the app or ingestion with AWDE_URL=http://127.0.0.1:8765/api/v2/.
+"""
+
+import json
+import math
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+endpoints = ["parliament-periods", "polls", "votes"]
+
+
+def _key(endpoint: str, params: dict) -> str:
+    """
+    File name of the response to a request; the same for the same parameters in
+    any order.
+    """
+    query = urlencode(sorted((k, str(v)) for k, v in params.items()))
+    return f"{endpoint}/{hashlib.sha1(query.encode()).hexdigest()}.json"
+
+
+class Recording:
+    """
+    Responses recorded by RecordingProxy, replayed as they were. Requests that
+    were not recorded get None, which the server answers with 404.
+
+    :param directory: where the responses were recorded
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def page(self, endpoint: str, params: dict) -> dict:
+        path = self.directory / _key(endpoint, params)
+        if not path.exists():
+            logger.warning(f"Not recorded: {endpoint} {params}")
+            return None
+        return json.loads(path.read_text())["response"]
+
+
+class RecordingProxy:
+    """
+    Forwards requests to an AWDE server and records its responses for a
+    Recording to replay.
+
+    :param directory: where to record the responses
+    :param upstream: URL of the AWDE API
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        upstream: str = "https://www.abgeordnetenwatch.de/api/v2/",
+    ):
+        self.directory = Path(directory)
+        self.upstream = upstream
+        self._session = requests.Session()
+
+    def page(self, endpoint: str, params: dict) -> dict:
+        response = self._session.get(self.upstream + endpoint, params=params)
+        response.raise_for_status()
+        data = response.json()
+
+        path = self.directory / _key(endpoint, params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps({"endpoint": endpoint, "params": params, "response": data})
+        )
+        return data
+
+
+@dataclass
+class Faults:
+    """
+    What goes wrong, and how slowly, when the server answers.
+
+    :param latency: seconds before each response
+    :param jitter: up to this many seconds more, at random
+    :param error_rate: share of requests answered with a 500 or 503
+    :param rate_limit: max. number of requests per second (bursts of up to
+        this many are allowed); more are answered with 429 and Retry-After.
+        None: no limit.
+    :param seed: seed of the random numbers, for reproducible errors
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    rate_limit: float = None
+    seed: int = 0
+    _random: random.Random = field(init=False, repr=False)
+    _tokens: float = field(init=False, repr=False)
+    _refilled: float = field(init=False, repr=False)
+    _lock: threading.Lock = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+        self._tokens = self.rate_limit or 0.0
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.jitter)
+
+    def error(self) -> int:
+        """
+        The status of a random server error, or None.
+        """
+        with self._lock:
+            if self._random.random() < self.error_rate:
+                return self._random.choice([500, 503])
+        return None
+
+    def retry_after(self) -> int:
+        """
+        Take a request from the rate limit: None if it may pass, else the
+        number of seconds until it would.
+        """
+        if not self.rate_limit:
+            return None
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate_limit,
+                self._tokens + (now - self._refilled) * self.rate_limit,
+            )
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            return max(1, math.ceil((1 - self._tokens) / self.rate_limit))
+
+
+def make_handler(source, faults: Faults = None, stats: dict = None) -> type:
+    """
+    A request handler class that serves pages from source under
+    /api/v2/<endpoint>.
+
+    :param source: anything with a page(endpoint, params) method that returns
+        the AWDE response as a dict, or None if there is none
+    :param faults: latency, errors and rate limit to add
+    :param stats: counts of requests and of responses by status, updated as
+        the server answers
+    """
+    faults = faults or Faults()
+    stats = stats if stats is not None else {}
+    lock = threading.Lock()
+
+    class AWDEHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def _count(self, status: int) -> None:
+            with lock:
+                stats["requests"] = stats.get("requests", 0) + 1
+                stats[status] = stats.get(status, 0) + 1
+
+        def _send(self, status: int, body: dict, headers: dict = {}) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, str(value))
+            self.end_headers()
+            self.wfile.write(data)
+            self._count(status)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+            retry_after = faults.retry_after()
+            if retry_after is not None:
+                return self._send(
+                    429,
+                    {"meta": {"status": "error"}, "data": "Too Many Requests"},
+                    {"Retry-After": retry_after},
+                )
+
+            time.sleep(faults.delay())
+
+            status = faults.error()
+            if status is not None:
+                return self._send(status, {"meta": {"status": "error"}, "data": []})
+
+            if endpoint not in endpoints:
+                return self._send(404, {"meta": {"status": "error"}, "data": []})
+
+            try:
+                body = source.page(endpoint, params)
+            except requests.RequestException as e:
+                logger.error(f"Upstream request failed: {e}")
+                return self._send(502, {"meta": {"status": "error"}, "data": []})
+
+            if body is None:
+                return self._send(404, {"meta": {"status": "error"}, "data": []})
+
+            # validators for conditional requests, as a caching server sends them:
+            etag = f'"{hashlib.sha1(json.dumps(body).encode()).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return self._count(304)
+
+            self._send(200, body, {"ETag": etag})
+
+    return AWDEHandler
+
+
+def serve(
+    source,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    faults: Faults = None,
+    stats: dict = None,
+) -> tuple:
+    """
+    Start serving source in a background thread.
+
+    :param source: e.g. a SyntheticAWDE or a Recording
+    :param host: interface to listen on
+    :param port: port to listen on; 0 picks a free one
+    :param faults: latency, errors and rate limit to add
+    :param stats: dict to count requests and responses in
+    :return: the server (call shutdown() to stop it) and its AWDE URL
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(source, faults, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url = f"http://{host}:{server.server_address[1]}/api/v2/"
+    logger.info(f"Serving AWDE stand-in at {url}")
+
+    return server, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--replay", type=Path, default=None, help="directory of recorded responses"
+    )
+    source.add_argument(
+        "--record", type=Path, default=None, help="directory to record responses in"
+    )
+    parser.add_argument(
+        "--upstream",
+        default="https://www.abgeordnetenwatch.de/api/v2/",
+        help="AWDE API to record from",
+    )
+    parser.add_argument("--legislatures", type=int, default=2)
+    parser.add_argument("--mdbs", type=int, default=736)
+    parser.add_argument("--polls", type=int, default=250)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.replay is not None:
+        source = Recording(args.replay)
+    elif args.record is not None:
+        source = RecordingProxy(args.record, args.upstream)
+    else:
+        from .synthetic import SyntheticAWDE
+
+        source = SyntheticAWDE(
+            legislatures=args.legislatures,
+            mdbs=args.mdbs,
+            polls=args.polls,
+            seed=args.seed,
+        )
+
+    faults = Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed,
+    )
+    stats = {}
+    server, url = serve(source, args.host, args.port, faults, stats)
+    print(f"AWDE stand-in at {url}; set AWDE_URL={url}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Served: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+A local HTTP server that answers like the DeepL translate endpoint, for testing
+and tuning translation offline. Point the app at it with the DEEPL_SERVER_URL
+environment variable (DEEPL_AUTH_KEY must be set, to anything):
+
+    python -m benchmarks.deepl_server --latency 0.2 --rate-limit 10
+
+It "translates" each text by prefixing it with the target language, and adds
+latency, server errors and a rate limit (429) as the AWDE stand-in does (see
+Faults in awde_server.py).
+"""
+
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from .awde_server import Faults
+
+logger = logging.getLogger(__name__)
+
+
+def make_handler(faults: Faults = None, stats: dict = None) -> type:
+    """
+    A request handler class that serves POST /v2/translate.
+
+    :param faults: latency, errors and rate limit to add
+    :param stats: counts of requests, of responses by status and of texts
+        translated, updated as the server answers
+    """
+    faults = faults or Faults()
+    stats = stats if stats is not None else {}
+    lock = threading.Lock()
+
+    class DeepLHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def _count(self, status: int, texts: int = 0) -> None:
+            with lock:
+                stats["requests"] = stats.get("requests", 0) + 1
+                stats[status] = stats.get(status, 0) + 1
+                stats["texts"] = stats.get("texts", 0) + texts
+
+        def _send(self, status: int, body: dict, texts: int = 0) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            self._count(status, texts)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            if faults.retry_after() is not None:
+                return self._send(429, {"message": "Too many requests"})
+
+            time.sleep(faults.delay())
+
+            status = faults.error()
+            if status is not None:
+                return self._send(status, {"message": "Internal error"})
+
+            if self.path.rstrip("/") != "/v2/translate":
+                return self._send(404, {"message": "Not found"})
+
+            if "json" in self.headers.get("Content-Type", ""):
+                request = json.loads(body)
+            else:
+                request = parse_qs(body.decode())
+            texts = request["text"]
+            target = request["target_lang"]
+            target = target[0] if isinstance(target, list) else target
+
+            self._send(
+                200,
+                {
+                    "translations": [
+                        {
+                            "detected_source_language": "DE",
+                            "text": f"{target}: {t}",
+                            "billed_characters": len(t),
+                        }
+                        for t in texts
+                    ]
+                },
+                texts=len(texts),
+            )
+
+    return DeepLHandler
+
+
+def serve(
+    host: str = "127.0.0.1", port: int = 0, faults: Faults = None, stats: dict = None
+) -> tuple:
+    """
+    Start serving in a background thread.
+
+    :param host: interface to listen on
+    :param port: port to listen on; 0 picks a free one
+    :param faults: latency, errors and rate limit to add
+    :param stats: dict to count requests and responses in
+    :return: the server (call shutdown() to stop it) and its URL
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(faults, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url = f"http://{host}:{server.server_address[1]}"
+    logger.info(f"Serving DeepL stand-in at {url}")
+
+    return server, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    faults = Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed,
+    )
+    stats = {}
+    server, url = serve(args.host, args.port, faults, stats)
+    print(f"DeepL stand-in at {url}; set DEEPL_SERVER_URL={url}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Served: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Time and memory-profile the data pipeline and the dashboard on synthetic AWDE
+data, and write the results to a JSON file, for comparison across commits:
+
+    python -m benchmarks.run --polls 250 --mdbs 736
+    python -m benchmarks.run --compare benchmarks/results/<earlier run>.json
+
+The app is pointed at a local stand-in server (see awde_server.py) and at a
+temporary data directory, so neither the real AWDE nor local data are touched.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .synthetic import SyntheticAWDE
+from .awde_server import Faults, serve
+
+results_dir = Path(__file__).resolve().parent / "results"
+
+
+def measure(fn, repeat: int = 3, setup=None) -> dict:
+    """
+    Run fn repeat times and once more under tracemalloc.
+
+    :param fn: the code to measure, without arguments
+    :param repeat: number of timed runs
+    :param setup: called before each run, not measured
+    :return: dict with the times of all runs (s) and the peak of memory
+        allocated by Python during one run (MB)
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "times_s": times,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "peak_mb": peak / 2**20,
+    }
+
+
+# run in a fresh process by private_memory(); prints the private memory (MB) that
+# loading the vote table adds, where /proc tells it:
+_private_memory_script = """
+import sys
+from pathlib import Path
+
+def private_mb():
+    rollup = Path("/proc/self/smaps_rollup")
+    if not rollup.exists():
+        return None
+    return sum(
+        int(line.split()[1]) for line in rollup.read_text().splitlines()
+        if line.startswith(("Private_Clean:", "Private_Dirty:"))
+    ) / 1024
+
+from bundestag.src.data.ensure_data import get_bundestag_legislatures, get_legislatures
+from bundestag.src.data.ensure_data import load_votes, open_votes
+
+legislatures = list(get_bundestag_legislatures(get_legislatures()))
+before = private_mb()
+votes = {loader}(legislatures=legislatures)
+# touch all data, as the dashboard eventually does:
+votes.memory_usage(deep=True)
+after = private_mb()
+print(None if before is None else after - before)
+"""
+
+
+def private_memory(loader: str) -> float:
+    """
+    Private (not shared) memory, in MB, that loading the vote table takes in a
+    new process; what each worker process and app instance pays for it. None
+    where /proc/self/smaps_rollup is not available.
+
+    :param loader: "open_votes" (the shared, memory-mapped table) or
+        "load_votes" (a copy read from the Parquet dataset)
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", _private_memory_script.format(loader=loader)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).resolve().parents[1],
+    ).stdout.split()[-1]
+    return None if output == "None" else float(output)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(source: SyntheticAWDE, repeat: int) -> dict:
+    """
+    Run all benchmarks against source. AWDE_URL and BUNDESTAG_DATA_DIR must be
+    set before this imports the app.
+    """
+    import plotly.io as pio
+    from flask import Flask
+
+    import bundestag
+    from bundestag import config
+    from bundestag.src.data.models import Dataset, query_all
+    from bundestag.src.data.ensure_data import (
+        get_bundestag_legislatures,
+        get_legislature_votes,
+        get_legislatures,
+        get_polls,
+        get_votes_store,
+        open_votes,
+    )
+    from bundestag.src.viz.figure_cache import figure_cache
+    from bundestag.src.viz.visualize import get_fig_dissenters, get_fig_votes
+
+    results = {}
+    legislature = source.parliament_periods[0]["id"]
+    poll = next(
+        p["id"] for p in source.poll_list if p["field_legislature"]["id"] == legislature
+    )
+
+    def no_store():
+        shutil.rmtree(config.data_dir, ignore_errors=True)
+        config.data_dir.mkdir(parents=True)
+        get_votes_store.cache_clear()
+
+    # raw requests:
+    results["query_all_polls"] = measure(
+        lambda: query_all(
+            config.awde_url,
+            "polls",
+            {"field_legislature[entity.id]": legislature},
+            workers=config.awde_workers,
+        ),
+        repeat,
+    )
+    results["query_all_votes"] = measure(
+        lambda: query_all(config.awde_url, "votes", {"poll": poll}), repeat
+    )
+
+    # a Dataset, fetched, loaded from cache and transformed:
+    def fetch_polls():
+        polls = Dataset(
+            name=f"polls_legislature_{legislature}",
+            awde_endpoint="polls",
+            awde_params={"field_legislature[entity.id]": legislature},
+        )
+        polls.fetch(save=True)
+
+    results["dataset_fetch"] = measure(fetch_polls, repeat)
+    results["dataset_load"] = measure(lambda: get_polls(legislature), repeat)
+    polls = get_polls(legislature)
+    results["dataset_transform"] = measure(
+        lambda: polls.transform_data(polls.rawdata), repeat
+    )
+
+    # all votes of a legislature, downloaded and from cache:
+    results["get_legislature_votes_cold"] = measure(
+        lambda: get_legislature_votes(legislature), 1, setup=no_store
+    )
+    results["get_legislature_votes_cached"] = measure(
+        lambda: get_legislature_votes(legislature), repeat
+    )
+
+    # the dashboard, once all data are downloaded and prepared:
+    flask_app = Flask(__name__)
+    bundestag.init_dashboard(flask_app, route="/")
+    client = flask_app.test_client()
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.5)
+
+    # memory per process, once the prepared table exists:
+    results["private_memory_mb"] = {
+        loader: private_memory(loader) for loader in ["open_votes", "load_votes"]
+    }
+
+    votes = open_votes(
+        legislatures=list(get_bundestag_legislatures(get_legislatures())),
+        language=config.current_language,
+    )
+    votes = votes.loc[votes.fid_legislatur.eq(legislature)]
+    fraction = votes.fraction.value_counts().index[0]
+    plot_data = votes.loc[votes.fraction.eq(fraction)]
+
+    results["get_fig_votes"] = measure(lambda: get_fig_votes(plot_data), repeat)
+    results["get_fig_dissenters"] = measure(
+        lambda: get_fig_dissenters(plot_data), repeat
+    )
+
+    # the figures as sent to the browser:
+    for name, fig in [
+        ("fig_votes_to_json", get_fig_votes(plot_data)),
+        ("fig_dissenters_to_json", get_fig_dissenters(plot_data)),
+    ]:
+        results[name] = measure(lambda: pio.to_json(fig, validate=False), repeat)
+        results[name]["bytes"] = len(pio.to_json(fig, validate=False))
+
+    dependencies = client.get("/_dash-dependencies").get_json()
+
+    def callback(prefix: str, inputs: list, state: list = []):
+        output = next(
+            d["output"] for d in dependencies if d["output"].startswith(prefix)
+        )
+        outputs = [
+            {"id": o.split(".")[0], "property": o.split(".")[1]}
+            for o in output.strip(".").split("...")
+        ]
+        response = client.post(
+            "/_dash-update-component",
+            json={
+                "output": output,
+                "outputs": outputs,
+                "inputs": inputs,
+                "state": state,
+                "changedPropIds": [f"{i['id']}.{i['property']}" for i in inputs],
+            },
+        )
+        return response.get_json()
+
+    selection = [
+        {"id": "legislature-dropdown", "property": "value", "value": legislature},
+        {"id": "fraction-dropdown", "property": "value", "value": fraction},
+    ]
+
+    def update_figures():
+        return callback("..fig-fraction.figure...fig-dissgrid.figure..", selection)
+
+    results["update_figures"] = measure(
+        update_figures, repeat, setup=figure_cache.clear
+    )
+    results["update_figures_cached"] = measure(update_figures, repeat)
+
+    # select every third point of the dissenter figure:
+    n_points = len(
+        update_figures()["response"]["fig-dissgrid"]["figure"]["data"][0]["x"]
+    )
+    selected = {
+        "points": [
+            {"curveNumber": 0, "pointIndex": i, "pointNumber": i}
+            for i in range(0, n_points, 3)
+        ]
+    }
+    results["update_selection"] = measure(
+        lambda: callback(
+            "..fig-fraction.figure@",
+            [
+                {"id": "fig-fraction", "property": "selectedData", "value": None},
+                {"id": "fig-dissgrid", "property": "selectedData", "value": selected},
+            ],
+            selection,
+        ),
+        repeat,
+    )
+
+    return results
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """
+    Print the median times of results relative to those of baseline.
+    """
+    print(f"{'benchmark':<32}{'baseline':>12}{'now':>12}{'ratio':>8}")
+    for name, now in results["benchmarks"].items():
+        if "median_s" not in now:
+            continue
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            print(f"{name:<32}{'':>12}{now['median_s']:>12.4f}")
+            continue
+        ratio = now["median_s"] / before["median_s"] if before["median_s"] else None
+        print(
+            f"{name:<32}{before['median_s']:>12.4f}{now['median_s']:>12.4f}"
+            f"{ratio if ratio is not None else float('nan'):>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--legislatures", type=int, default=2)
+    parser.add_argument("--mdbs", type=int, default=736)
+    parser.add_argument("--polls", type=int, default=250)
+    parser.add_argument("--dissent-rate", type=float, default=0.03)
+    parser.add_argument("--no-show-rate", type=float, default=0.08)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per AWDE response"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument(
+        "--compare", type=Path, default=None, help="results of an earlier run"
+    )
+    args = parser.parse_args()
+
+    source = SyntheticAWDE(
+        legislatures=args.legislatures,
+        mdbs=args.mdbs,
+        polls=args.polls,
+        dissent_rate=args.dissent_rate,
+        no_show_rate=args.no_show_rate,
+        seed=args.seed,
+    )
+    faults = Faults(latency=args.latency, jitter=args.jitter, seed=args.seed)
+    server, url = serve(source, faults=faults)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.environ["AWDE_URL"] = url
+        os.environ["BUNDESTAG_DATA_DIR"] = data_dir
+        benchmarks = run_benchmarks(source, args.repeat)
+
+    server.shutdown()
+
+    from bundestag import config
+
+    import pandas as pd
+    import pyarrow as pa
+
+    results = {
+        "commit": git_commit(),
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "pyarrow": pa.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "synthetic": {
+            "legislatures": source.legislatures,
+            "mdbs": source.mdbs,
+            "polls": source.polls,
+            "dissent_rate": source.dissent_rate,
+            "no_show_rate": source.no_show_rate,
+            "seed": source.seed,
+            "latency": faults.latency,
+            "jitter": faults.jitter,
+        },
+        "config": {
+            "awde_workers": config.awde_workers,
+            "awde_requests_per_second": config.awde_requests_per_second,
+        },
+        "benchmarks": benchmarks,
+    }
+
+    output = args.output or results_dir / (
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        f"-{(results['commit'] or 'nocommit')[:8]}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare is not None:
+        compare(results, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Synthetic data in the shape of the abgeordnetenwatch (AWDE) API v2, for the
+endpoints the app uses: parliament-periods, polls and votes.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# fractions and their share of seats, roughly as in the Bundestag 2021 - 2025:
+fractions = [
+    ("SPD", 0.28),
+    ("CDU/CSU", 0.27),
+    ("BÜNDNIS 90/DIE GRÜNEN", 0.16),
+    ("FDP", 0.125),
+    ("AfD", 0.105),
+    ("DIE LINKE.", 0.05),
+    ("fraktionslos", 0.01),
+]
+vote_options = ["yes", "no", "abstain"]
+
+
+@dataclass
+class SyntheticAWDE:
+    """
+    A made-up but AWDE-shaped set of legislatures, polls and votes. Polls and
+    legislatures are generated up front; the votes of a poll are generated on
+    request, always the same for the same seed, so that large setups do not
+    need to be kept in memory.
+
+    :param legislatures: number of Bundestag legislatures
+    :param mdbs: number of MdBs (members of parliament) per legislature, < 10000
+    :param polls: number of polls per legislature
+    :param dissent_rate: share of votes that differ from the fraction majority
+    :param no_show_rate: share of MdBs who do not vote in a poll
+    :param seed: seed of the random numbers
+    """
+
+    legislatures: int = 2
+    mdbs: int = 736
+    polls: int = 250
+    dissent_rate: float = 0.03
+    no_show_rate: float = 0.08
+    seed: int = 0
+    parliament_periods: list = field(init=False, repr=False)
+    poll_list: list = field(init=False, repr=False)
+
+    def __post_init__(self):
+        rng = np.random.default_rng(self.seed)
+
+        self.parliament_periods = [
+            {
+                "id": 100 + i,
+                "entity_type": "parliament_period",
+                "label": f"Bundestag {2001 + 4 * i} - {2005 + 4 * i}",
+                "type": "legislature",
+            }
+            for i in range(self.legislatures)
+        ]
+        # a legislature of another parliament, which the app has to leave out:
+        self.parliament_periods.append(
+            {
+                "id": 99,
+                "entity_type": "parliament_period",
+                "label": "Hamburg 2020 - 2025",
+                "type": "legislature",
+            }
+        )
+
+        self.poll_list = []
+        for i, period in enumerate(self.parliament_periods[:-1]):
+            year = 2001 + 4 * i
+            days = np.sort(rng.integers(0, 4 * 365, size=self.polls))
+            for k in range(self.polls):
+                poll_id = 10_000 * (i + 1) + k
+                date = np.datetime64(f"{year}-01-01") + np.timedelta64(days[k], "D")
+                self.poll_list.append(
+                    {
+                        "id": poll_id,
+                        "entity_type": "node",
+                        "label": f"Gesetz Nr. {poll_id} zur Änderung von Dingen",
+                        "api_url": f"https://www.abgeordnetenwatch.de/api/v2/polls/{poll_id}",
+                        "field_accepted": bool(rng.random() < 0.7),
+                        "field_committees": [],
+                        "field_intro": "<p>Lorem ipsum dolor sit amet.</p>",
+                        "field_legislature": {
+                            "id": period["id"],
+                            "entity_type": "parliament_period",
+                            "label": period["label"],
+                        },
+                        "field_poll_date": str(date),
+                        "field_topics": [
+                            {"id": int(t), "label": f"Thema {t}"}
+                            for t in rng.choice(
+                                30, size=rng.integers(0, 4), replace=False
+                            )
+                        ],
+                    }
+                )
+
+        # newest first, as AWDE delivers them:
+        self.poll_list.reverse()
+        self._polls = {p["id"]: p for p in self.poll_list}
+
+    def _mdb_fractions(self) -> np.ndarray:
+        shares = np.array([share for _, share in fractions])
+        seats = np.floor(shares / shares.sum() * self.mdbs).astype(int)
+        seats[0] += self.mdbs - seats.sum()
+        return np.repeat(np.arange(len(fractions)), seats)
+
+    def votes(self, poll_id: int) -> list:
+        """
+        The votes of all MdBs in one poll.
+        """
+        poll = self._polls.get(poll_id)
+        if poll is None:
+            return []
+
+        rng = np.random.default_rng([self.seed, poll_id])
+        period = poll["field_legislature"]
+        mdb_fraction = self._mdb_fractions()
+
+        # the majority vote of each fraction, and who deviates from it:
+        line = rng.integers(0, len(vote_options), size=len(fractions))
+        vote = line[mdb_fraction]
+        dissent = rng.random(self.mdbs) < self.dissent_rate
+        vote[dissent] = (
+            vote[dissent] + rng.integers(1, len(vote_options), size=dissent.sum())
+        ) % len(vote_options)
+        options = np.array(vote_options + ["no_show"], dtype=object)[vote]
+        options[rng.random(self.mdbs) < self.no_show_rate] = "no_show"
+
+        parliament = period["label"].removeprefix("Bundestag ")
+        first_vote_id = poll_id * 10_000
+
+        return [
+            {
+                "id": first_vote_id + m,
+                "entity_type": "vote",
+                "label": f"MdB {m} - {poll['label']}",
+                "mandate": {
+                    "id": period["id"] * 10_000 + m,
+                    "entity_type": "candidacy_mandate",
+                    "label": f"MdB {m} (Bundestag {parliament})",
+                },
+                "fraction": {
+                    "id": int(mdb_fraction[m]) + 1,
+                    "entity_type": "fraction",
+                    "label": f"{fractions[mdb_fraction[m]][0]} (Bundestag {parliament})",
+                },
+                "poll": {"id": poll_id, "entity_type": "node", "label": poll["label"]},
+                "vote": options[m],
+                "reason_no_show": "Sonstiges" if options[m] == "no_show" else None,
+                "reason_no_show_other": None,
+            }
+            for m in range(self.mdbs)
+        ]
+
+    def query(self, endpoint: str, params: dict) -> list:
+        """
+        All results of a query, before paging.
+
+        :param endpoint: AWDE endpoint, e.g. "polls"
+        :param params: query parameters as AWDE takes them (all values str)
+        """
+        if endpoint == "parliament-periods":
+            return self.parliament_periods
+
+        if endpoint == "polls":
+            polls = self.poll_list
+            legislature = params.get("field_legislature[entity.id]")
+            if legislature is not None:
+                polls = [
+                    p for p in polls if str(p["field_legislature"]["id"]) == legislature
+                ]
+            since = params.get("field_poll_date[gte]")
+            if since is not None:
+                polls = [p for p in polls if p["field_poll_date"] >= since]
+            return polls
+
+        if endpoint == "votes":
+            return self.votes(int(params["poll"]))
+
+        return []
+
+    def page(self, endpoint: str, params: dict) -> dict:
+        """
+        One page of results, with the "meta" AWDE sends along.
+
+        :param endpoint: AWDE endpoint, e.g. "polls"
+        :param params: query parameters, including page and pager_limit
+        """
+        results = self.query(endpoint, params)
+        pager_limit = int(params.get("pager_limit", 100))
+        page = int(params.get("page", 0))
+        data = results[page * pager_limit : (page + 1) * pager_limit]
+
+        return {
+            "meta": {
+                "abgeordnetenwatch_api": {"version": "2.8"},
+                "status": "ok",
+                "result": {
+                    "count": len(data),
+                    "total": len(results),
+                    "page": page,
+                    "results_per_page": pager_limit,
+                },
+            },
+            "data": data,
+        }
@@ -0,0 +1,59 @@
+"""
+Time the translation of new labels against a local DeepL stand-in (see
+deepl_server.py), with latency and a rate limit as DeepL might impose:
+
+    python -m benchmarks.translate --labels 600 --latency 0.2 --rate-limit 10
+"""
+
+import os
+import sys
+import time
+import argparse
+
+from .awde_server import Faults
+from .deepl_server import serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--labels", type=int, default=600)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from bundestag.config import deepl_batch_size, deepl_workers
+    from bundestag.src.i18n import get_translator, translate_batch
+
+    faults = Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed,
+    )
+    stats = {}
+    server, url = serve(faults=faults, stats=stats)
+
+    # after importing i18n, which loads .env:
+    os.environ["DEEPL_AUTH_KEY"] = "stand-in"
+    os.environ["DEEPL_SERVER_URL"] = url
+    get_translator.cache_clear()
+
+    labels = [f"Gesetz Nr. {i} zur Änderung von Dingen" for i in range(args.labels)]
+    start = time.perf_counter()
+    translations = translate_batch(labels, tgt="EN-GB")
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    assert translations == [f"EN-GB: {label}" for label in labels]
+    print(
+        f"{args.labels} labels in {elapsed:.2f} s ({deepl_batch_size} per request, "
+        f"{deepl_workers} at a time); served: {stats}"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
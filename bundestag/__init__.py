@@ -1,11 +1,11 @@
 import sys
 import logging
+import threading
 from pathlib import Path
 
-import numpy as np
-import pandas as pd
 import dash_bootstrap_components as dbc
-from dash import Dash, dcc, html, Input, Output
+from dash import Dash, dcc, html, Input, Output, State, Patch, ClientsideFunction
+from dash.exceptions import PreventUpdate
 
 # import from config relatively, so it remains portable:
 dashapp_rootdir = Path(__file__).resolve().parents[1]
@@ -13,13 +13,22 @@ sys.path.append(str(dashapp_rootdir))
 
 from .src.data.ensure_data import (
     ensure_data_bundestag,
+    get_bundestag_legislatures,
+    get_dataset_version,
     get_legislatures,
+    open_votes,
 )
 from .src.log_config import setup_logger
-from .config import cached_dataset
-from .src.i18n import translate as t, translate_series
+from .config import cached_dataset, startup_in_background, sync_on_startup
+from .src.data_holder import DataHolder, VoteData
+from .src.i18n import translate as t
 from .src.language_context import language_context
-from .src.viz.visualize import get_fig_dissenters, get_fig_votes
+from .src.viz.visualize import (
+    get_fig_dissenters,
+    get_fig_votes,
+)
+from .src.viz.figure_cache import figure_cache
+from .src.viz.selection_index import SelectionIndex
 
 
 setup_logger()
@@ -47,29 +56,20 @@ def init_dashboard(flask_app, route):
     # Initialization
     #
 
-    # legislature selection data:
-    # dict: {id: label}
-    legislature_labels = get_legislatures().data
-    legislature_labels = (
-        legislature_labels.loc[
-            legislature_labels.label.str.contains("Bundestag"), ["id", "label"]
-        ]
-        .set_index("id")
-        .to_dict()["label"]
-    )
-
-    # the dataset:
-    ensure_data_bundestag()
-
-    data = pd.read_parquet(cached_dataset)
-    data.label = translate_series(data.label)
-
-    data = data.loc[data.vote.ne("no_show")]
-    data.vote = pd.Categorical(
-        data.vote, ordered=True, categories=["yes", "no", "abstain"]
-    )
-
-    logger.info(f"votes: {type(data)} {data.shape}")
+    # the data; loaded in the background if so configured, so that the server
+    # can respond (see the readiness route below) while data are prepared. A
+    # missing dataset is built here, too, so that it had better be built before
+    # (see config.startup_in_background):
+    holder = DataHolder()
+    if startup_in_background:
+        threading.Thread(
+            target=warm_up,
+            args=(holder, current_language),
+            name=f"{app_name}_warm_up",
+            daemon=True,
+        ).start()
+    else:
+        warm_up(holder, current_language)
 
     # prose paragraphs:
     prosepath = dashapp_rootdir / "bundestag" / "src" / "prose"
@@ -136,10 +136,8 @@ def init_dashboard(flask_app, route):
                                         [
                                             dcc.Dropdown(
                                                 id="legislature-dropdown",
-                                                options=[
-                                                    {"label": v, "value": k}
-                                                    for k, v in legislature_labels.items()
-                                                ],
+                                                # set once data are ready:
+                                                options=[],
                                                 value=132,  # Bundestag 2021 - 2025
                                                 clearable=False,
                                                 style={"z-index": "1050"},
@@ -152,10 +150,7 @@ def init_dashboard(flask_app, route):
                                         [
                                             dcc.Dropdown(
                                                 id="fraction-dropdown",
-                                                options=[
-                                                    {"label": f, "value": f}
-                                                    for f in data.fraction.unique()
-                                                ],
+                                                options=[],
                                                 value="SPD",
                                                 clearable=False,
                                                 style={"z-index": "1050"},
@@ -167,6 +162,22 @@ def init_dashboard(flask_app, route):
                                 ],
                                 class_name="mt-4",
                             ),
+                            # while data are loading:
+                            dbc.Row(
+                                [
+                                    dbc.Col(
+                                        [
+                                            html.Div(id="data-status"),
+                                            dcc.Interval(
+                                                id="data-interval", interval=2000
+                                            ),
+                                        ],
+                                        xs={"size": 12},
+                                        lg={"size": 8, "offset": 2},
+                                        class_name="para mt-4",
+                                    )
+                                ]
+                            ),
                             dbc.Row(
                                 [
                                     dbc.Col(
@@ -184,8 +195,10 @@ def init_dashboard(flask_app, route):
                                         [
                                             dcc.Graph(
                                                 id="fig-fraction",
+                                                clear_on_unhover=True,
                                                 # figure=get_fig_votes(data.loc[data.fraction.eq("SPD")], [445997])
-                                            )
+                                            ),
+                                            dcc.Tooltip(id="tooltip-fraction"),
                                         ],
                                         xs={"size": 12},
                                         lg={"size": 10, "offset": 1},
@@ -207,7 +220,12 @@ def init_dashboard(flask_app, route):
                             dbc.Row(
                                 [
                                     dbc.Col(
-                                        [dcc.Graph(id="fig-dissgrid")],
+                                        [
+                                            dcc.Graph(
+                                                id="fig-dissgrid", clear_on_unhover=True
+                                            ),
+                                            dcc.Tooltip(id="tooltip-dissgrid"),
+                                        ],
                                         xs={"size": 12},
                                         lg={"size": 10, "offset": 1},
                                         class_name="figure mt-4",
@@ -249,51 +267,215 @@ def init_dashboard(flask_app, route):
         ],
     )
 
-    init_callbacks(app, data, current_language)
+    init_callbacks(app, holder, current_language)
+
+    # hit/miss counters of the figure cache:
+    flask_app.add_url_rule(
+        f"{route}figure-cache",
+        endpoint=f"{app_name}_figure_cache",
+        view_func=figure_cache.info,
+    )
+
+    # for load balancers: 200 once data are ready, 503 before:
+    flask_app.add_url_rule(
+        f"{route}ready",
+        endpoint=f"{app_name}_ready",
+        view_func=lambda: (holder.status(), 200 if holder.ready else 503),
+    )
 
     return app
 
 
-def init_callbacks(app, data, language):
+def load_vote_data(language: str) -> VoteData:
+    """
+    Ensure that the dataset is present (see ensure_data_bundestag()) and load
+    what the dashboard shows in the given language.
+    """
+    # legislature selection data:
+    # dict: {id: label}
+    legislature_labels = get_bundestag_legislatures(get_legislatures())
+
+    # the dataset:
+    ensure_data_bundestag(sync=sync_on_startup)
+
+    # the legislatures on offer, memory-mapped and shared with the other
+    # processes and app instances; labels were translated at ingestion:
+    data = open_votes(
+        cached_dataset,
+        legislatures=list(legislature_labels),
+        language=language,
+    )
+
+    logger.info(f"votes: {type(data)} {data.shape}")
+
+    return VoteData(
+        data=data,
+        legislature_labels=legislature_labels,
+        dataset_version=get_dataset_version(cached_dataset),
+        selection_index=SelectionIndex(data),
+    )
+
+
+# the app instances (one per language) of a process warm up one after the
+# other, so that only the first of them downloads and prepares data:
+_warm_up_lock = threading.Lock()
+
+
+def warm_up(holder: DataHolder, language: str) -> None:
+    """
+    Load the dashboard data into holder, recording a failure instead of
+    raising it.
+    """
+    try:
+        with _warm_up_lock:
+            holder.set(load_vote_data(language))
+        logger.info(f"Data for the {language} dashboard are ready.")
+    except Exception as e:
+        logger.exception("Loading data failed.")
+        holder.fail(e)
+
+
+def init_callbacks(app, holder: DataHolder, language):
+
+    # fill the legislature selection once data are ready:
+    @app.callback(
+        Output("legislature-dropdown", "options"),
+        Output("data-status", "children"),
+        Output("data-interval", "disabled"),
+        Input("data-interval", "n_intervals"),
+    )
+    def update_data_status(n_intervals, language=language):
+        vote_data = holder.current
+
+        language_context.set_language(language)
+
+        if vote_data is None:
+            if holder.state == "failed":
+                return [], t("Die Daten konnten nicht geladen werden."), True
+            return (
+                [],
+                t("Die Daten werden geladen. Das kann beim ersten Start dauern."),
+                False,
+            )
+
+        return (
+            [{"label": v, "value": k} for k, v in vote_data.legislature_labels.items()],
+            None,
+            True,
+        )
 
-    # update plots from selection
+    # build plots for a legislature and fraction; a selection on the previous
+    # figures is cleared, as its points do not belong to the new ones:
     @app.callback(
         Output("fig-fraction", "figure"),
         Output("fig-dissgrid", "figure"),
+        Output("fig-fraction", "selectedData"),
+        Output("fig-dissgrid", "selectedData"),
         Input("legislature-dropdown", "value"),
         Input("fraction-dropdown", "value"),
-        Input("fig-fraction", "selectedData"),
-        Input("fig-dissgrid", "selectedData"),
     )
-    def update_everything(legislature, fraction, selection_frac, selection_grid, language=language):
-        plot_data = data.loc[
-            data.fid_legislatur.eq(legislature) & data.fraction.eq(fraction)
-        ]
+    def update_figures(legislature, fraction, language=language):
+        vote_data = holder.current
+        if vote_data is None:
+            raise PreventUpdate
 
         language_context.set_language(language)
 
-        selected_votes = data.vote_id.tolist()
+        def build():
+            data = vote_data.data
+            plot_data = data.loc[
+                data.fid_legislatur.eq(legislature) & data.fraction.eq(fraction)
+            ]
+            return get_fig_votes(plot_data), get_fig_dissenters(plot_data)
 
-        for selected_data in [selection_frac, selection_grid]:
-            if selected_data and selected_data["points"]:
-                selected_votes = list(
-                    np.intersect1d(
-                        selected_votes,
-                        [p["customdata"][4] for p in selected_data["points"]],
-                    )
-                )
-        frac_fig = get_fig_votes(plot_data, selected_votes)
-        diss_fig = get_fig_dissenters(plot_data, selected_votes)
+        frac_fig, diss_fig = figure_cache.get(
+            (legislature, fraction, language, vote_data.dataset_version), build
+        )
 
         return (
             frac_fig,
             diss_fig,
+            None,
+            None,
         )
 
+    # update plots from selection; only the selected points of each trace
+    # are sent to the browser, not the whole figures:
     @app.callback(
-        Output("fraction-dropdown", "options"), Input("legislature-dropdown", "value")
+        Output("fig-fraction", "figure", allow_duplicate=True),
+        Output("fig-dissgrid", "figure", allow_duplicate=True),
+        Input("fig-fraction", "selectedData"),
+        Input("fig-dissgrid", "selectedData"),
+        State("legislature-dropdown", "value"),
+        State("fraction-dropdown", "value"),
+        prevent_initial_call=True,
     )
-    def update_available_parties(legislature):
+    def update_selection(selection_frac, selection_grid, legislature, fraction):
+        vote_data = holder.current
+        if vote_data is None:
+            raise PreventUpdate
+
+        selection_index = vote_data.selection_index
+        selected_votes = None
+
+        for figure, selected_data in [
+            ("votes", selection_frac),
+            ("dissenters", selection_grid),
+        ]:
+            if selected_data and selected_data["points"]:
+                points = selection_index.resolve(
+                    legislature, fraction, figure, selected_data["points"]
+                )
+                selected_votes = (
+                    points
+                    if selected_votes is None
+                    else list(set(selected_votes).intersection(points))
+                )
+
+        votes_points, diss_points = selection_index.selectedpoints(
+            legislature, fraction, selected_votes
+        )
+
+        frac_patch = Patch()
+        for trace, points in votes_points.items():
+            frac_patch["data"][trace]["selectedpoints"] = points
+
+        diss_patch = Patch()
+        for trace, points in diss_points.items():
+            diss_patch["data"][trace]["selectedpoints"] = points
+
+        return (
+            frac_patch,
+            diss_patch,
+        )
+
+    # hover labels, filled in the browser from the lookup tables the figures
+    # carry (see _hover_lookup()):
+    for graph, tooltip in [
+        ("fig-fraction", "tooltip-fraction"),
+        ("fig-dissgrid", "tooltip-dissgrid"),
+    ]:
+        app.clientside_callback(
+            ClientsideFunction(namespace="bundestag", function_name="hover"),
+            Output(tooltip, "show"),
+            Output(tooltip, "bbox"),
+            Output(tooltip, "children"),
+            Input(graph, "hoverData"),
+            State(graph, "figure"),
+        )
+
+    @app.callback(
+        Output("fraction-dropdown", "options"),
+        Input("legislature-dropdown", "value"),
+        # fires again when data have become ready:
+        Input("legislature-dropdown", "options"),
+    )
+    def update_available_parties(legislature, legislature_options):
+        vote_data = holder.current
+        if vote_data is None:
+            raise PreventUpdate
+
+        data = vote_data.data
         parties = data.loc[data.fid_legislatur.eq(legislature), "fraction"].unique()
         return [{"label": p, "value": p} for p in parties]
 
@@ -301,4 +483,7 @@ def init_callbacks(app, data, language):
         Output("fraction-dropdown", "value"), Input("fraction-dropdown", "options")
     )
     def update_selected_party(available_options):
+        if not available_options:
+            raise PreventUpdate
+
         return available_options[0]["value"]
@@ -0,0 +1,43 @@
+// Hover labels of the figures (see _hover_lookup() in visualize.py): each point
+// carries indices into the lookup tables in the figure's layout.meta, its trace
+// the lines of the label in trace.meta. Fills in the lines of the hovered point
+// for a dcc.Tooltip.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    bundestag: {
+        hover: function (hoverData, figure) {
+            const point = hoverData && hoverData.points[0];
+            const trace = point && figure && figure.data[point.curveNumber];
+            if (!trace || !trace.meta || !point.customdata) {
+                return [false, null, null];
+            }
+
+            const lookup = figure.layout.meta;
+            const values = {};
+            trace.meta.fields.forEach(function (field, i) {
+                const value = lookup[field][point.customdata[i]];
+                values[field] = value === undefined ? "" : value;
+            });
+
+            const children = [];
+            trace.meta.hover.forEach(function (line, i) {
+                const text = line.replace(/\{(\w+)\}/g, function (match, field) {
+                    return values[field];
+                });
+                if (i === 0) {
+                    children.push({
+                        namespace: "dash_html_components",
+                        type: "B",
+                        props: {children: text},
+                    });
+                } else {
+                    children.push(
+                        {namespace: "dash_html_components", type: "Br", props: {}},
+                        text
+                    );
+                }
+            });
+
+            return [true, point.bbox, children];
+        },
+    },
+});
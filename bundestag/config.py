@@ -1,12 +1,60 @@
+import os
 from pathlib import Path
 
 dashapp_rootdir = Path(__file__).resolve().parents[1]
+# where downloaded and prepared data are kept:
+data_dir = Path(os.getenv("BUNDESTAG_DATA_DIR", dashapp_rootdir / "data"))
 # we use en/de, DeepL uses EN-GB/DE
 language_codes = {
     "de": "DE",
     "en": "EN-GB",
 }
 current_language = "de"
+# DeepL: texts per request (API max. 50), parallel requests, and retries per request
+# after a 429 or 5xx (by the DeepL client, with exponential backoff):
+deepl_batch_size = 50
+deepl_workers = 4
+deepl_retries = 5
 
-awde_url = "https://www.abgeordnetenwatch.de/api/v2/"
-cached_dataset = dashapp_rootdir / "data" / "votes_bundestag.parquet"
+# AWDE_URL points the app at another server, e.g. a local stand-in:
+awde_url = os.getenv("AWDE_URL", "https://www.abgeordnetenwatch.de/api/v2/")
+# number of parallel requests to AWDE; also the size of the HTTP connection pool:
+awde_workers = 8
+# politeness limit: max. number of requests per second to one host (None: no limit).
+# The rate is halved whenever AWDE answers 429/503, and creeps back up from there:
+awde_requests_per_second = 20
+# attempts per page after a 429, a 5xx or a network error, with pauses growing from
+# awde_backoff seconds; and seconds to wait for a response:
+awde_retries = 6
+awde_backoff = 1.0
+awde_timeout = 60
+# pages of multi-page queries are kept here until the query is complete, so that an
+# interrupted query resumes where it stopped:
+checkpoint_dir = data_dir / "checkpoints"
+# ETag/Last-Modified of AWDE responses, to ask AWDE whether fetched data changed:
+http_cache = data_dir / "http_cache.json"
+# processes that build the vote data of legislatures in parallel (None: one per CPU;
+# 1: no separate processes). Raw data are fetched from AWDE before, in this process.
+# Each process holds one legislature while building it, so memory grows with the
+# largest legislature times the number of processes:
+build_workers = 1
+# vote-level data as a Hive-partitioned Parquet dataset (one directory per
+# partition; add "fraction" to split legislatures further):
+cached_dataset = data_dir / "votes_bundestag"
+dataset_partitioning = ["fid_legislatur"]
+# the vote table as the dashboard uses it, an uncompressed Arrow IPC file that
+# all app instances and worker processes memory-map and thus share:
+prepared_table = data_dir / "votes_bundestag.arrow"
+
+# load data in a background thread, so that the server responds (and reports
+# readiness at <route>ready) while data are downloaded or prepared. That thread
+# downloads and builds the dataset, too, if it is missing (or syncs it, see
+# sync_on_startup), inside the web process; build processes are then spawned, not
+# forked (see build_legislatures()). Off by default: build the data before the app
+# starts, with `python -m bundestag.update_data`:
+startup_in_background = False
+# bring locally stored data up to date with AWDE whenever the app starts:
+sync_on_startup = False
+
+# number of figure pairs (legislature x fraction x language) kept in memory:
+figure_cache_size = 256
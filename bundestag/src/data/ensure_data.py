@@ -1,14 +1,36 @@
 import os
+import shutil
+import multiprocessing
+from collections import deque
+from collections.abc import Iterator
+from functools import cache
 from pathlib import Path
+from urllib.parse import quote
 import logging
 import json
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import deepl
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dotenv import load_dotenv, find_dotenv
 
-from bundestag.src.data.models import Dataset
-
+from bundestag.config import (
+    awde_workers,
+    build_workers,
+    cached_dataset,
+    data_dir,
+    dataset_partitioning,
+    language_codes,
+    prepared_table,
+)
+from bundestag.src.data.models import Dataset, RawStore, response_cache
+from bundestag.src.file_lock import file_lock
+from bundestag.src.i18n import get_translations, translate_series
 
 load_dotenv(find_dotenv(), override=True)
 logger = logging.getLogger(__name__)
@@ -16,6 +38,34 @@ dashapp_rootdir = Path(__file__).resolve().parents[3]
 logger.info(f"ensure_data root: {dashapp_rootdir}")
 
 
+vote_options = pd.CategoricalDtype(["yes", "no", "abstain", "no_show"], ordered=True)
+
+# compact layout of the vote-level data; strings are categorical, counts fit
+# into 16 bits (a poll has < 1000 votes), IDs into 32 bits. Labels in other
+# languages (label_en, ...) are categorical, too.
+vote_dtypes = {
+    "fraction": "category",
+    "poll_id": "int32",
+    "name": "category",
+    "vote_id": "int32",
+    "vote": vote_options,
+    "fid_legislatur": "int32",
+    "fid_topic": "category",
+    "label": "category",
+    "date": pd.ArrowDtype(pa.date32()),
+    "parliament_vote": "category",
+    "n_votes": "int16",
+    "sum_yes": "int16",
+    "sum_no": "int16",
+    "sum_abs": "int16",
+    "party_line": vote_options,
+    "on_party_line": "bool",
+    "n_dissent": "int16",
+    "unanimity": "int16",
+    "y": "int16",
+}
+
+
 def get_legislatures(parliament: str = None):
     """
     Given the label of a parliament plus time period ("Bundestag 2021 - 2025",
@@ -41,14 +91,22 @@ def get_legislatures(parliament: str = None):
         },
     )
     # Dataset tries to load locally present data, but if not present, does not trigger the
-    # download by itself. the fetch() method does this. save() means we keep the goods:
-    if legislatures.data is None:
-        legislatures.fetch()
-        legislatures.save()
+    # download by itself. the fetch() method does this. save=True keeps the goods:
+    if not legislatures.cached:
+        legislatures.fetch(save=True)
 
     return legislatures
 
 
+def _strip_parliament(entities: pa.ChunkedArray) -> pa.ChunkedArray:
+    """
+    From a column of AWDE entities (structs with a label such as
+    "Jane Doe (Bundestag 2021 - 2025)"), take the label without the parliament.
+    """
+    labels = pc.struct_field(entities, "label")
+    return pc.replace_substring_regex(labels, pattern=r" \(Bundestag.*", replacement="")
+
+
 def get_polls(legislature: int = None):
     """
     Given the ID (integer) of a legislature, fetch all polls done during that legislature. A
@@ -67,25 +125,42 @@ def get_polls(legislature: int = None):
         awde_endpoint="polls",
         awde_params={"field_legislature[entity.id]": legislature},
     )
-    if polls.data is None:
-        polls.fetch()
-        polls.save()
+    if not polls.cached:
+        polls.fetch(save=True)
 
     def _transform_polls(data: pd.DataFrame) -> pd.DataFrame:
-        df = data.copy()
-        df.rename(
-            {"field_accepted": "accepted", "field_poll_date": "date"},
-            axis=1,
-            inplace=True,
-        )
-        df["parliament_vote"] = df.accepted.apply(lambda x: "yes" if x else "no")
-        df["fid_legislatur"] = df.field_legislature.apply(lambda x: x["id"])
-        df["fid_topic"] = df.field_topics.apply(
-            lambda x: ",".join([str(i["id"]) for i in x]) if x is not None else None
-        )
-        df = df[
-            ["id", "fid_legislatur", "fid_topic", "label", "date", "parliament_vote"]
-        ]
+        table = pa.Table.from_pandas(data, preserve_index=False)
+
+        # topics come as a list of structs per poll; join their IDs to "1,2,3":
+        topics = table["field_topics"].combine_chunks()
+        if pa.types.is_list(topics.type):
+            topic_ids = pc.cast(
+                pc.struct_field(pc.list_flatten(topics), "id"), pa.string()
+            )
+            offsets = np.concatenate(
+                [[0], np.cumsum(pc.list_value_length(topics).fill_null(0))]
+            )
+            fid_topic = pc.binary_join(
+                pa.ListArray.from_arrays(
+                    pa.array(offsets, pa.int32()), topic_ids, mask=topics.is_null()
+                ),
+                ",",
+            )
+        else:
+            fid_topic = pa.nulls(len(table), pa.string())
+
+        df = pa.table(
+            {
+                "id": table["id"],
+                "fid_legislatur": pc.struct_field(table["field_legislature"], "id"),
+                "fid_topic": fid_topic,
+                "label": table["label"],
+                "date": table["field_poll_date"],
+                "parliament_vote": pc.if_else(
+                    pc.fill_null(table["field_accepted"], False), "yes", "no"
+                ),
+            }
+        ).to_pandas()
 
         return df
 
@@ -94,64 +169,154 @@ def get_polls(legislature: int = None):
     return polls
 
 
-def get_votes(poll: int = None):
+@cache
+def get_votes_store() -> RawStore:
+    """
+    The store that holds the raw votes of all polls (see RawStore).
+    """
+    return RawStore(data_dir / "votes")
+
+
+def compact_votes_store() -> None:
+    """
+    Merge the raw votes store into one segment and move the votes of polls that
+    are still cached as single files (data/votes_poll_{id}.parquet) into it.
+    """
+    loose_files = sorted(data_dir.glob("votes_poll_*.parquet"))
+    logger.info(f"Compacting votes store, {len(loose_files)} single files to move.")
+
+    get_votes_store().compact(loose_files)
+
+
+def _transform_votes(data: pd.DataFrame) -> pd.DataFrame:
+    # We want our vote data to look different from what we get from AWDE.
+    # This function creates a pretty version of the raw data on the fly,
+    # and we make it the display function of all vote Datasets;
+    # (raw data stay untouched):
+    table = pa.Table.from_pandas(data, preserve_index=False)
+
+    df = pa.table(
+        {
+            "fid_poll": pc.struct_field(table["poll"], "id"),
+            "fid_vote": table["id"],
+            "name": _strip_parliament(table["mandate"]),
+            "fraction": _strip_parliament(table["fraction"]),
+            "vote": table["vote"],
+            "reason_no_show": table["reason_no_show"],
+            "reason_no_show_other": table["reason_no_show_other"],
+        }
+    ).to_pandas()
+
+    return df
+
+
+def get_votes(poll: int = None, fetch: bool = True):
     """
     Get vote-level data for a given poll.
 
+    Votes fetched from AWDE go into the votes store, which is written on its next
+    flush() (get_legislature_votes() takes care of that).
+
     :param poll: ID of the poll. Get this int ID using get_polls() and looking up the ID
+    :param fetch: fetch the votes from AWDE if they are not cached. If False, the
+        Dataset is only set up; cached votes are read when first used, or for many
+        polls at once with Dataset.load_all().
     """
 
     logger.info(f"Loading voting data from poll ID {poll}")
 
     votes = Dataset(
-        name=f"votes_poll_{poll}", awde_endpoint="votes", awde_params={"poll": poll}
+        name=f"votes_poll_{poll}",
+        awde_endpoint="votes",
+        awde_params={"poll": poll},
+        store=get_votes_store(),
     )
-    if votes.data is None:
-        votes.fetch()
-        votes.save()
+    votes.transform_data = _transform_votes
 
-    # We want our vote data to look different from what we get from AWDE.
-    # This function creates a pretty version of the raw data on the fly,
-    # and we make it the display function of all Datasets in all_votes;
-    # (raw data stay untouched):
-    def _transform_vote(data):
-        df = data.copy()
+    if fetch and not votes.cached:
+        votes.fetch(save=True)
 
-        df["name"] = df.mandate.apply(
-            lambda d: d["label"].split(" (Bundestag")[0] if d is not None else None
-        )
-        df["fid_vote"] = df.id
-        df["fid_poll"] = df.poll.apply(lambda d: d["id"])
-        df["fraction"] = df.fraction.apply(
-            lambda d: d["label"].split(" (Bundestag")[0] if d is not None else None
-        )
+    return votes
 
-        df = df[
-            [
-                "fid_poll",
-                "fid_vote",
-                "name",
-                "fraction",
-                "vote",
-                "reason_no_show",
-                "reason_no_show_other",
-            ]
-        ]
 
-        return df
+def _fetch_votes(poll_ids: list, workers: int = awde_workers) -> list:
+    """
+    Fetch the votes of those polls that are not cached, `workers` polls at a
+    time, and write them to the votes store.
 
-    votes.transform_data = _transform_vote
+    :return: the vote Datasets of all polls, in the order of poll_ids
+    """
+    all_votes = [get_votes(poll=id, fetch=False) for id in poll_ids]
+    missing = [votes for votes in all_votes if not votes.cached]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda votes: votes.fetch(save=True), missing))
+    get_votes_store().flush()
 
-    return votes
+    return all_votes
+
+
+def prefetch_legislature(legislature: int, workers: int = awde_workers) -> None:
+    """
+    Make sure the raw data of a legislature, its polls and their votes, are
+    cached, without processing them.
 
+    :param legislature: ID of the legislature
+    :param workers: max. number of polls whose votes are fetched at the same time
+    """
+    _fetch_votes(get_polls(legislature=legislature).data.id.tolist(), workers)
+
+
+def build_legislatures(legislatures: list, workers: int = build_workers) -> Iterator:
+    """
+    Process the vote data of several legislatures (see get_legislature_votes()).
+    The raw data are fetched first, in this process, so that requests to AWDE stay
+    within one throttle. The legislatures are then processed in parallel by a pool
+    of `workers` processes, each from the raw data cache.
+
+    Results are yielded one legislature at a time, and no more than `workers` of
+    them are processed ahead of the consumer; so with one worker, no more than one
+    legislature is held in memory at a time. Each further worker is a spawned
+    process that holds a legislature of its own (see config.build_workers).
+
+    :param legislatures: IDs of the legislatures
+    :param workers: number of processes; None for one per CPU, 1 to process the
+        legislatures one after another in this process
+    :return: iterator over the legislatures' vote data, in the order of legislatures
+    """
+    workers = min(workers or os.cpu_count(), len(legislatures))
+    if workers <= 1:
+        for legislature in legislatures:
+            yield get_legislature_votes(legislature=legislature)
+        return None
 
-def get_legislature_votes(legislature: int) -> pd.DataFrame:
+    for legislature in legislatures:
+        prefetch_legislature(legislature)
+
+    logger.info(f"Processing {len(legislatures)} legislatures in {workers} processes.")
+    # spawned, not forked: the app may call this with threads running (see
+    # startup_in_background), and a forked child could inherit their held locks:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for legislature in legislatures:
+            pending.append(pool.submit(get_legislature_votes, legislature))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def get_legislature_votes(
+    legislature: int, workers: int = awde_workers
+) -> pd.DataFrame:
     """
     For one legislature (parliament x period), ensure presence of vote-level data
     on all polls.
 
     :param legislature: ID of the legislature. Get this int ID using
         get_legislatures() and looking up the ID paired with the leg. of interest.
+    :param workers: max. number of polls whose votes are loaded or fetched at the
+        same time. Requests to AWDE stay within awde_requests_per_second anyway.
 
     :return: processed df with vote-level data of this legislature
     """
@@ -162,17 +327,19 @@ def get_legislature_votes(legislature: int) -> pd.DataFrame:
     all_polls: Dataset = get_polls(legislature=legislature)
     poll_ids: list = all_polls.data.id.tolist()
 
-    # based on the poll IDs, collect all votes for each poll as a dataframe
-    all_votes = {}
-    for id in poll_ids:
-        all_votes[id] = get_votes(poll=id)
-    allvotes = pd.concat([i.data for i in all_votes.values()])
-
-    df = (
-        allvotes.set_index("fid_poll")
-        .join(all_polls.data.set_index("id"))
-        .reset_index()
-        .rename({"fid_poll": "poll_id", "fid_vote": "vote_id"}, axis=1)
+    # based on the poll IDs, collect all votes for each poll as a dataframe:
+    # the missing ones from AWDE, then the cached ones in one bulk read. The order
+    # of poll_ids is kept, so the result does not depend on workers:
+    all_votes = _fetch_votes(poll_ids, workers)
+    Dataset.load_all(all_votes)
+    # _transform_votes works row by row, so it can take all polls in one go:
+    allvotes = _transform_votes(
+        pd.concat([votes.rawdata for votes in all_votes], ignore_index=True)
+    )
+
+    polls = all_polls.data.rename({"id": "fid_poll"}, axis=1)
+    df = allvotes.merge(polls, how="left", on="fid_poll").rename(
+        {"fid_poll": "poll_id", "fid_vote": "vote_id"}, axis=1
     )
 
     df.fraction = df.fraction.replace(
@@ -188,11 +355,14 @@ def get_legislature_votes(legislature: int) -> pd.DataFrame:
         }
     )
 
+    # overall result of each poll, counting all votes:
     df["n_votes"] = df.groupby("poll_id").poll_id.transform("size")
-    df["sum_yes"] = df.groupby("poll_id").vote.transform(lambda x: (x == "yes").sum())
-    df["sum_no"] = df.groupby("poll_id").vote.transform(lambda x: (x == "no").sum())
-    df["sum_abs"] = df.groupby("poll_id").vote.transform(lambda x: (x == "abs").sum())
-    df.set_index("poll_id", inplace=True)
+    for column, option in [
+        ("sum_yes", "yes"),
+        ("sum_no", "no"),
+        ("sum_abs", "abstain"),
+    ]:
+        df[column] = df.vote.eq(option).groupby(df.poll_id).transform("sum")
 
     # remove fractionless votes:
     old_nrow = len(df)
@@ -202,12 +372,10 @@ def get_legislature_votes(legislature: int) -> pd.DataFrame:
     logger.info(f"Fractionless deletion removes {a} rows, {round(b, 1)}% of votes.")
 
     # cast vote as ordered Category type:
-    df.vote = pd.Categorical(
-        df.vote, ordered=True, categories=["yes", "no", "abstain", "no_show"]
-    )
-    df.reset_index(inplace=True)
+    df.vote = df.vote.astype(vote_options)
 
-    # poll_id being int should not mess with the y-position of traces, so cast as str:
+    # polls are ordered by their ID as str (see add_party_line_metrics(), sort
+    # below), which decides the y-position of polls with equal unanimity:
     df.poll_id = df.poll_id.astype("str")
 
     # drop no_shows and the columns that explain no_shows:
@@ -215,87 +383,554 @@ def get_legislature_votes(legislature: int) -> pd.DataFrame:
         ["reason_no_show", "reason_no_show_other"], axis=1
     )
 
-    # add party line per poll and fraction:
-    party_line = (
-        df.groupby(["fraction", "poll_id"])
-        .vote.apply(lambda x: x.mode())
-        .reset_index(level=-1, drop=True)
-    )
-    party_line.name = "party_line"
-    df = (
-        df.reset_index()
-        .set_index(["fraction", "poll_id"])
-        .join(party_line)
-        .reset_index()
-    )
+    df = add_party_line_metrics(df)
 
     # MdB x-position:
     # sort within each fraction and poll;
     # first, by "within vs. without party line"
     # second, by vote; => no effect on party line voters, but dissenters are grouped by their vote
-    # finally, enumerate for x position by groups: fraction, poll, partyline (both dissent options should be counted together)
     df = df.sort_values(["fraction", "poll_id", "party_line", "vote"])
-    df["on_party_line"] = df.vote == df.party_line
-    # df["x"] = (
-    #     df.groupby(["fraction", "poll_id", "on_party_line"], observed=True)
-    #     .cumcount()
-    #     .add(1)
-    # )
-    # df.x = df.apply(lambda x: -x.x if x.vote == x.party_line else x.x, axis=1)
-
-    # mark dissenting voters:
-    dissenters = (
-        df.groupby(["fraction", "name"])
-        .apply(lambda x: sum(x.on_party_line == False), include_groups=False)
-        .to_frame("n_dissent")
+
+    return conform_votes(df.reset_index(drop=True))[
+        [
+            "fraction",
+            "poll_id",
+            "name",
+            "vote_id",
+            "vote",
+            "fid_legislatur",
+            "fid_topic",
+            "label",
+            "date",
+            "parliament_vote",
+            "n_votes",
+            "sum_yes",
+            "sum_no",
+            "sum_abs",
+            "party_line",
+            "on_party_line",
+            "n_dissent",
+            "unanimity",
+            "y",
+        ]
+    ]
+
+
+def add_party_line_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add party line, dissent and unanimity to the vote-level data of one
+    legislature. All of them derive from one table that counts the votes per
+    fraction x poll x vote option:
+
+    - party_line: the most frequent vote of a fraction in a poll. On a tie, the
+      option that comes first among the vote categories (yes, no, abstain) wins.
+    - on_party_line: whether a vote equals the party line.
+    - n_dissent: number of votes off the party line, per MdB and fraction.
+    - unanimity: number of votes on the party line, per fraction and poll.
+    - y: rank of a poll within its fraction by unanimity (ties by poll_id).
+
+    Votes without a valid vote option, and votes of no known fraction, poll or
+    MdB are not counted: they are not on the party line and count as nobody's
+    dissent. A fraction x poll without counted votes has no party line.
+
+    :param df: vote-level data, fractionless votes and no_shows removed, with
+        vote as a Categorical
+    :return: df with the above columns added
+    """
+    # codes are -1 for missing values:
+    vote_codes = df.vote.cat.codes.to_numpy()
+    n_options = len(df.vote.cat.categories)
+    fraction_codes, fractions = pd.factorize(df.fraction, sort=True)
+    poll_codes, polls = pd.factorize(df.poll_id, sort=True)
+    name_codes, names = pd.factorize(df.name)
+
+    # count table, one row per fraction x poll, one column per vote option:
+    n_groups = len(fractions) * len(polls)
+    has_group = (fraction_codes >= 0) & (poll_codes >= 0)
+    group = np.where(has_group, fraction_codes * len(polls) + poll_codes, 0)
+    counted = has_group & (vote_codes >= 0)
+    counts = np.bincount(
+        group[counted] * n_options + vote_codes[counted],
+        minlength=n_groups * n_options,
+    ).reshape(n_groups, n_options)
+
+    # argmax returns the first of equal maxima, which makes ties deterministic:
+    line_codes = counts.argmax(axis=1)
+    line_codes[counts.sum(axis=1) == 0] = -1
+    unanimity = counts[np.arange(n_groups), line_codes]
+    on_party_line = counted & (vote_codes == line_codes[group])
+
+    has_person = (fraction_codes >= 0) & (name_codes >= 0)
+    person = fraction_codes * len(names) + name_codes
+    n_dissent = np.bincount(
+        person[counted & has_person & ~on_party_line],
+        minlength=len(fractions) * len(names),
+    )
+
+    # rank the polls of each fraction by unanimity; groups come in order of
+    # fraction and poll_id, lexsort is stable, so ties keep poll_id order:
+    present = np.flatnonzero(np.bincount(group[has_group], minlength=n_groups))
+    ranked = present[np.lexsort((unanimity[present], present // len(polls)))]
+    ranked_fraction = ranked // len(polls)
+    y = np.zeros(n_groups, dtype="int64")
+    y[ranked] = (
+        np.arange(len(ranked))
+        - np.searchsorted(ranked_fraction, ranked_fraction, side="left")
+        + 1
+    )
+
+    return df.assign(
+        party_line=pd.Categorical.from_codes(
+            np.where(has_group, line_codes[group], -1), dtype=df.vote.dtype
+        ),
+        on_party_line=on_party_line,
+        n_dissent=np.where(has_person, n_dissent[person], 0),
+        unanimity=np.where(has_group, unanimity[group], 0),
+        y=np.where(has_group, y[group], 0),
+    )
+
+
+def get_bundestag_legislatures(legislatures: Dataset) -> dict:
+    """
+    From the legislatures Dataset, pick those of the Bundestag.
+
+    :return: dict {id: label}
+    """
+    data = legislatures.data
+
+    return (
+        data.loc[data.label.str.contains("Bundestag"), ["id", "label"]]
+        .set_index("id")
+        .to_dict()["label"]
     )
-    df = df.set_index(["fraction", "name"]).join(dissenters).reset_index()
-
-    # poll y-position:
-    # compute degree of unanimity as (1 + N_dissenters) / (N_lineVoters)
-    unanimity = (
-        df.groupby(["fraction", "poll_id"])
-        .apply(lambda df: df.on_party_line.sum(), include_groups=False)
-        .to_frame("unanimity")
-        .sort_values(["fraction", "unanimity"])
+
+
+def conform_votes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bring vote-level data into the compact layout of vote_dtypes. Categories
+    of unordered categoricals are sorted, so that sorting by such a column
+    sorts alphabetically, however the data were combined before.
+
+    :param df: vote-level data
+    :return: df with the dtypes of vote_dtypes
+    """
+    dtypes = {c: t for c, t in vote_dtypes.items() if c in df}
+    dtypes.update({c: "category" for c in df if c.startswith("label_")})
+
+    if "date" in dtypes and not isinstance(df["date"].dtype, pd.ArrowDtype):
+        df = df.assign(date=pd.to_datetime(df["date"]))
+    df = df.astype(dtypes)
+
+    for column, dtype in dtypes.items():
+        if isinstance(dtype, str) and dtype == "category":
+            categories = df[column].cat.categories
+            if not categories.is_monotonic_increasing:
+                df[column] = df[column].cat.reorder_categories(categories.sort_values())
+
+    return df
+
+
+def add_label_translations(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store poll labels as categorical and add a column of translated labels for
+    each language the app is offered in (label_en, ...), so that the app does
+    not need to translate anything when it starts. Missing translations are
+    requested from DeepL first (see get_translations()); labels still without
+    one (e.g. without a DeepL key) are null, and filled in from the dictionary
+    when the data are loaded (see _use_language()).
+
+    :param df: vote-level data with a column "label" of German poll labels
+    :return: df with the new columns
+    """
+    df["label"] = df["label"].astype("category")
+    labels = df["label"].cat.categories.to_series()
+
+    for language in language_codes:
+        if language == "de":
+            continue
+        get_translations(labels, language)
+        df[f"label_{language}"] = translate_series(
+            df["label"], language, keep_untranslated=False
+        )
+
+    return df
+
+
+def write_votes(
+    df: pd.DataFrame, path: Path, partition_cols: list = dataset_partitioning
+) -> None:
+    """
+    Write vote-level data into the Hive-partitioned dataset at path. Partitions
+    contained in df replace those already present; all others stay untouched.
+
+    :param df: vote-level data as returned by get_legislature_votes()
+    :param path: root directory of the dataset
+    :param partition_cols: columns whose values make up the partition directories
+    """
+    df = conform_votes(df)
+
+    # clear whole partitions of the top level, in case they had sub-partitions
+    # (e.g. fractions) that are not in df anymore:
+    top = partition_cols[0]
+    for value in df[top].unique():
+        shutil.rmtree(path / f"{top}={quote(str(value), safe='')}", ignore_errors=True)
+
+    for values, partition in df.groupby(partition_cols, observed=True):
+        directory = path.joinpath(
+            *[f"{c}={quote(str(v), safe='')}" for c, v in zip(partition_cols, values)]
+        )
+        directory.mkdir(parents=True)
+        pq.write_table(
+            pa.Table.from_pandas(
+                partition.drop(columns=partition_cols), preserve_index=False
+            ),
+            directory / "part-0.parquet",
+        )
+
+
+def load_votes(
+    path: Path = cached_dataset,
+    legislatures: list = None,
+    fractions: list = None,
+    columns: list = None,
+    language: str = None,
+) -> pd.DataFrame:
+    """
+    Load vote-level data from the partitioned dataset at path. Only partitions
+    (and row groups) matching the given legislatures and fractions are read, and
+    only the given columns.
+
+    :param path: root directory of the dataset
+    :param legislatures: IDs of the legislatures to load; all if None
+    :param fractions: fractions to load; all if None
+    :param columns: columns to load; all if None
+    :param language: if given, "label" holds the poll labels in this language,
+        taken from the stored translations (see add_label_translations()), and
+        the labels in other languages are not loaded
+    """
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+
+    if language is not None:
+        columns = [
+            c
+            for c in (columns or dataset.schema.names)
+            if not c.startswith("label_") or c == f"label_{language}"
+        ]
+
+    filters = []
+    if legislatures is not None:
+        filters.append(ds.field("fid_legislatur").isin(legislatures))
+    if fractions is not None:
+        filters.append(ds.field("fraction").isin(fractions))
+
+    expression = None
+    for f in filters:
+        expression = f if expression is None else expression & f
+
+    df = dataset.to_table(columns=columns, filter=expression).to_pandas(
+        types_mapper=_arrow_backed
     )
-    unanimity["y"] = unanimity.groupby(["fraction"]).cumcount().add(1)
-    df = df.set_index(["fraction", "poll_id"]).join(unanimity).reset_index()
+
+    return _use_language(df, language)
+
+
+def _arrow_backed(arrow_type: pa.DataType) -> pd.ArrowDtype:
+    """
+    types_mapper for pa.Table.to_pandas(): keep strings and dates in Arrow
+    memory instead of converting them to Python objects.
+    """
+    if pa.types.is_string(arrow_type) or pa.types.is_date(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+
+
+def _use_language(df: pd.DataFrame, language: str = None) -> pd.DataFrame:
+    """
+    Put the poll labels in the given language into column "label" and drop the
+    other languages' labels (see add_label_translations()). Labels stored
+    without translation are looked up in the dictionary, which may have them by
+    now, and stay German if it does not.
+    """
+    if language is None:
+        return df
+
+    label_column = f"label_{language}"
+    if label_column in df:
+        stored = df[label_column]
+        missing = stored.isna().to_numpy()
+        if missing.any():
+            # a column of nulls only is not read back as categorical:
+            stored = stored.astype("category")
+            current = translate_series(df["label"], language)
+            # merge both by category; the rows themselves are only indexed:
+            categories = stored.cat.categories.union(current.cat.categories)
+            codes = np.where(
+                missing,
+                _recode(current, categories),
+                _recode(stored, categories),
+            )
+            stored = pd.Series(
+                pd.Categorical.from_codes(codes, categories=categories),
+                index=df.index,
+            )
+        df["label"] = stored
+    elif "label" in df:
+        # stored before translations were written along:
+        df["label"] = translate_series(df["label"], language)
+
+    # in place; drop() would copy the (possibly memory-mapped) data:
+    for column in [c for c in df if c.startswith("label_")]:
+        del df[column]
 
     return df
 
 
+def _recode(series: pd.Series, categories: pd.Index) -> np.ndarray:
+    """
+    Codes of a categorical series in terms of other categories, which must
+    include its own; -1 for nulls.
+    """
+    return np.append(categories.get_indexer(series.cat.categories), -1)[
+        series.cat.codes.to_numpy()
+    ]
+
+
+def get_dataset_version(path: Path = cached_dataset) -> int:
+    """
+    Identify the state of the dataset at path by the time its newest file was
+    written, so that anything derived from it can tell when it changed.
+    """
+    return max(f.stat().st_mtime_ns for f in path.rglob("*.parquet"))
+
+
+def prepare_votes(
+    path: Path = cached_dataset,
+    prepared: Path = prepared_table,
+    legislatures: list = None,
+) -> None:
+    """
+    Write the vote table as the dashboard uses it (no no-shows; labels in all
+    languages) to an uncompressed Arrow IPC file, see open_votes(). The file
+    records which dataset version and legislatures it holds, and is replaced
+    atomically, so that processes opening it never see a half-written file.
+
+    :param path: root directory of the dataset
+    :param prepared: the file to write
+    :param legislatures: IDs of the legislatures to include; all if None
+    """
+    version = get_dataset_version(path)
+
+    votes = load_votes(path, legislatures=legislatures)
+    votes = conform_votes(votes.loc[votes.vote.ne("no_show")].reset_index(drop=True))
+    votes.vote = votes.vote.cat.remove_categories("no_show")
+
+    table = pa.Table.from_pandas(votes, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {
+            **table.schema.metadata,
+            b"dataset_version": str(version).encode(),
+            b"legislatures": json.dumps(legislatures).encode(),
+        }
+    )
+
+    tmp_file = prepared.with_name(f"{prepared.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp_file), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_file, prepared)
+
+    logger.info(f"Prepared {len(votes)} votes in {prepared}.")
+
+
+def _is_prepared(path: Path, prepared: Path, legislatures: list = None) -> bool:
+    """
+    Whether the prepared vote table exists and holds the current dataset and
+    the given legislatures.
+    """
+    if not prepared.exists():
+        return False
+
+    metadata = pa.ipc.open_file(pa.memory_map(str(prepared))).schema.metadata
+    return (
+        metadata.get(b"dataset_version") == str(get_dataset_version(path)).encode()
+        and metadata.get(b"legislatures") == json.dumps(legislatures).encode()
+    )
+
+
+def open_votes(
+    path: Path = cached_dataset,
+    prepared: Path = prepared_table,
+    legislatures: list = None,
+    language: str = None,
+) -> pd.DataFrame:
+    """
+    Open the prepared vote table (see prepare_votes()), preparing it first if
+    it is missing or out of date. Of several processes that find it so at the
+    same time, one prepares it and the others wait for it.
+
+    The file is memory-mapped and numbers, strings and dates are used in
+    place, not copied, so that all processes and app instances opening it
+    share one copy of the data in the OS page cache. Strings and dates are
+    therefore backed by Arrow (pd.ArrowDtype), and numeric columns are
+    read-only.
+
+    :param path: root directory of the dataset
+    :param prepared: the prepared vote table
+    :param legislatures: IDs of the legislatures to include; all if None
+    :param language: if given, "label" holds the poll labels in this language
+    """
+    if not _is_prepared(path, prepared, legislatures):
+        with file_lock(prepared.with_suffix(".lock")):
+            # another process may have prepared it while we waited:
+            if not _is_prepared(path, prepared, legislatures):
+                prepare_votes(path, prepared, legislatures)
+
+    table = pa.ipc.open_file(pa.memory_map(str(prepared))).read_all()
+    df = table.to_pandas(split_blocks=True, types_mapper=_arrow_backed)
+
+    return _use_language(df, language)
+
+
+def recheck_legislature(legislature: int, workers: int = awde_workers) -> bool:
+    """
+    Ask AWDE whether the polls of a legislature, or the votes in any of them,
+    changed since they were fetched, and update the cached data that did.
+    Unchanged data cost a conditional request each, answered without a body
+    (see ResponseCache). Data fetched without validators are fetched in full.
+
+    :param legislature: ID of the legislature
+    :param workers: max. number of polls rechecked at the same time
+    :return: whether anything changed
+    """
+    polls = get_polls(legislature=legislature)
+    changed = polls.fetch(if_modified=True, save=True)
+
+    def _recheck(poll: int) -> bool:
+        votes = get_votes(poll=poll)
+        return votes.fetch(if_modified=True, save=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        changed_polls = sum(pool.map(_recheck, polls.data.id.tolist()))
+    get_votes_store().flush()
+    response_cache.flush()
+
+    logger.info(
+        f"Rechecked legislature {legislature}: polls "
+        f"{'changed' if changed else 'unchanged'}, votes of {changed_polls} "
+        f"of {len(polls.data)} polls changed."
+    )
+    return changed or changed_polls > 0
+
+
 def ensure_data_bundestag(
-    file: Path = dashapp_rootdir / "data" / "votes_bundestag.parquet",
+    file: Path = cached_dataset,
+    sync: bool = False,
+    workers: int = build_workers,
 ) -> None:
     """
     Ensure that all voting data are present locally. That is, check if they are,
-    and if not, download them from AWDE. 
+    and if not, download them from AWDE.
+
+    Legislatures are written to their partitions one at a time, so memory grows
+    with the largest legislature times `workers`, not with all legislatures.
 
-    :param file: the local parquet file to store voting data in.
-    :param translate: if not None, identifier for DeepL to translate vote labels
-        into. Otherwise, things stay in German.
+    :param file: the local dataset directory to store voting data in.
+    :param sync: if data are present locally, bring them up to date with AWDE
+        (see sync_data_bundestag()) instead of leaving them as they are.
+    :param workers: number of processes that process legislatures (see
+        build_legislatures()).
     """
     logger.info("Ensuring data are present locally. If not, this may take a while.")
 
-    if file.is_file():
-        logger.info("Data are cached already.")
+    if file.exists():
+        if sync:
+            sync_data_bundestag(file, workers=workers)
+        else:
+            logger.info("Data are cached already.")
         return None
 
-    legislatures = get_legislatures().data
-    legislatures = (
-        legislatures.loc[legislatures.label.str.contains("Bundestag"), ["id", "label"]]
-        .set_index("id")
-        .to_dict()["label"]
-    )
+    legislatures = get_bundestag_legislatures(get_legislatures())
 
-    # load or fetch all voting data;
-    # fetching takes long, around 1 hour (but then data are locally present)
-    all_votes = pd.concat(
-        [get_legislature_votes(legislature=i) for i in legislatures.keys()]
-    )
-    all_votes.to_parquet(dashapp_rootdir / "data" / "votes_bundestag.parquet")
+    # write next to the target and move in place when complete, so that an
+    # interrupted run does not leave a dataset that looks cached:
+    tmp_file = file.with_name(file.name + ".tmp")
+    shutil.rmtree(tmp_file, ignore_errors=True)
+
+    # load or fetch all voting data; polls of a legislature are fetched in
+    # parallel, legislatures are processed in parallel (see build_legislatures),
+    # and each is written to its partitions as soon as it is processed:
+    for votes in build_legislatures(list(legislatures.keys()), workers):
+        write_votes(add_label_translations(votes), tmp_file)
+
+    tmp_file.rename(file)
+
+
+def sync_data_bundestag(
+    file: Path = cached_dataset, recheck: bool = False, workers: int = build_workers
+) -> None:
+    """
+    Add polls to the locally stored voting data that AWDE has published since
+    the last download. Only polls dated on or after the latest stored date are
+    queried, only votes of polls not yet stored are fetched, and only the
+    legislatures that received new polls are processed again and rewritten.
+
+    The cached polls of an affected legislature are updated, too, so that a
+    rebuild from cache yields the same data.
+
+    :param file: the local dataset directory that holds the voting data.
+    :param recheck: also ask AWDE whether stored polls or votes were corrected
+        (see recheck_legislature()), and rewrite the legislatures where any were.
+    :param workers: number of processes that process legislatures (see
+        build_legislatures()).
+    """
+    stored = load_votes(file, columns=["poll_id", "date"])
+    # as AWDE takes dates, e.g. "2024-06-13" (date is a datetime.date):
+    latest = stored.date.max().isoformat()
+    known_polls = set(stored.poll_id.astype(int))
+    logger.info(f"Syncing {len(known_polls)} stored polls, latest from {latest}.")
+
+    # a new legislature may have begun since the last sync:
+    legislatures = get_legislatures()
+    legislatures.fetch(save=True)
+
+    to_update = []
+    for legislature in get_bundestag_legislatures(legislatures):
+        changed = recheck and recheck_legislature(legislature)
+
+        # polls from the day of the latest stored poll on; that day may not
+        # have been complete at the last sync. Not cached, used only to update:
+        recent_polls = Dataset(
+            name=f"polls_legislature_{legislature}_since_{latest}",
+            awde_endpoint="polls",
+            awde_params={
+                "field_legislature[entity.id]": legislature,
+                "field_poll_date[gte]": latest,
+            },
+        )
+        recent_polls.fetch()
+        new_polls = recent_polls.rawdata
+        if len(new_polls) > 0:
+            new_polls = new_polls.loc[~new_polls.id.isin(known_polls)]
+
+        if len(new_polls) > 0:
+            logger.info(f"{len(new_polls)} new polls in legislature {legislature}.")
+
+            polls = get_polls(legislature=legislature)
+            polls.rawdata = pd.concat([new_polls, polls.rawdata]).drop_duplicates(
+                subset="id"
+            )
+            polls.save()
+        elif not changed:
+            continue
+
+        to_update.append(legislature)
+
+    if not to_update:
+        logger.info("No new or changed polls found.")
+        return None
+
+    # votes of all other polls in these legislatures come from cache;
+    # each replaces the partitions of its legislature only:
+    for votes in build_legislatures(to_update, workers):
+        write_votes(add_label_translations(votes), file)
 
-    # Ensure presence of translations in our dictionary:
-    # if tgt_lang is not None:
-    #     get_translations(all_votes.label)
+    logger.info(f"Updated legislatures {to_update} in {file}.")
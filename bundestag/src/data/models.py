@@ -1,29 +1,426 @@
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import atexit
 import json
+import math
+import os
+import random
+import shutil
+import uuid
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 import logging
 
-from ...config import awde_url
+from urllib.parse import urlencode, urlparse
+
+from ..file_lock import file_lock
+from ...config import (
+    awde_backoff,
+    awde_requests_per_second,
+    awde_retries,
+    awde_timeout,
+    awde_url,
+    awde_workers,
+    checkpoint_dir,
+    data_dir,
+    http_cache,
+)
 
 logger = logging.getLogger(__name__)
 dashapp_rootdir = Path(__file__).resolve().parents[3]
 logger.info(f"models root: {dashapp_rootdir}")
 
+_session = None
+_session_lock = threading.Lock()
 
-def query_all(
+
+class HostThrottle:
+    """
+    Spaces out the start of requests to one host so that no more than `rate`
+    requests per second go out, no matter how many threads send them.
+
+    The rate adapts to what the host tells us (additive increase, multiplicative
+    decrease): it is halved when the host signals overload, and afterwards each
+    successful request raises it a little, up to `max_rate`.
+    """
+
+    min_rate = 0.5
+
+    def __init__(self, rate: float = None):
+        self.max_rate = rate
+        self.rate = rate
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        # reserve the next free slot, then sleep outside the lock until it comes:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            if self.rate:
+                self._next_start = start + 1 / self.rate
+
+        time.sleep(start - now)
+
+    def slow_down(self, retry_after: float = None) -> None:
+        """
+        Halve the rate, and hold back all requests for retry_after seconds.
+        Without a rate (no limit), the first slow-down starts at awde_workers
+        requests per second.
+        """
+        with self._lock:
+            self.rate = max(self.min_rate, (self.rate or awde_workers) / 2)
+            if retry_after is not None:
+                self._next_start = max(self._next_start, time.monotonic() + retry_after)
+        logger.warning(f"Throttling requests to {self.rate:.2f}/s")
+
+    def speed_up(self) -> None:
+        """
+        Raise the rate by one request per second over the next `rate` requests.
+        """
+        with self._lock:
+            if self.rate is None:
+                return None
+            self.rate += 1 / self.rate
+            if self.max_rate is not None:
+                self.rate = min(self.rate, self.max_rate)
+
+
+_throttles = {}
+_throttles_lock = threading.Lock()
+
+
+def get_throttle(url: str) -> HostThrottle:
+    """
+    Return the throttle for the host of the given url.
+    """
+    host = urlparse(url).netloc
+
+    with _throttles_lock:
+        if host not in _throttles:
+            _throttles[host] = HostThrottle(awde_requests_per_second)
+
+    return _throttles[host]
+
+
+def get_session() -> requests.Session:
+    """
+    Return the HTTP session shared by all queries of this process. It keeps
+    connections to AWDE alive between requests and pools up to `awde_workers`
+    of them, so that parallel page requests don't each open a new connection.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=awde_workers, pool_maxsize=awde_workers
+            )
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+
+    return _session
+
+
+def _retry_after(response: requests.Response) -> float:
+    """
+    Seconds to wait as requested by the Retry-After header, or None.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def _get_page(
+    url: str,
+    params: dict,
+    retries: int = awde_retries,
+    cache: "ResponseCache" = None,
+    conditional: bool = False,
+    validators: dict = None,
+) -> dict:
+    """
+    Request a single page and return the parsed response.
+
+    Rate limits (429), server errors (5xx) and network errors are retried with
+    exponential backoff and jitter, or after as long as the server asks for in
+    Retry-After. Rate limits and 503 also slow down all requests to the host.
+    Other errors raise at once.
+
+    :param cache: where to keep the validators of the response
+    :param conditional: send the validators in cache along, and return None
+        without reading a body if AWDE answers that the page has not changed (304)
+    :param validators: dict to collect the validators of the response in, to be
+        kept in cache once its data are saved (see ResponseCache.update()); if
+        None, they are kept in cache right away
+    """
+    throttle = get_throttle(url)
+    headers = cache.headers(url, params) if conditional else {}
+
+    for attempt in range(retries + 1):
+        throttle.wait()
+        retry_after = None
+
+        try:
+            response = get_session().get(
+                url, params=params, headers=headers, timeout=awde_timeout
+            )
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            status = e.response.status_code
+            if status != 429 and status < 500:
+                raise
+            retry_after = _retry_after(e.response)
+            if status in (429, 503):
+                throttle.slow_down(retry_after)
+            error = e
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        else:
+            throttle.speed_up()
+            if response.status_code == 304:
+                return None
+            response_dict = json.loads(response.text)
+            if cache is not None:
+                entries = cache.validators(
+                    url, params, response, response_dict["meta"]["result"]
+                )
+                if validators is None:
+                    cache.update(entries)
+                else:
+                    validators.update(entries)
+            return response_dict
+
+        if attempt == retries:
+            raise error
+
+        backoff = random.uniform(0, min(60.0, awde_backoff * 2**attempt))
+        wait = backoff if retry_after is None else retry_after + backoff
+        logger.warning(f"{error}; retrying in {wait:.1f} s.")
+        time.sleep(wait)
+
+
+class PageCheckpoint:
+    """
+    The pages of one query, kept on disk as they arrive. If the query is
+    interrupted, the next run of the same query only requests the missing pages,
+    as long as AWDE reports the same total of results; otherwise the pages on
+    disk are discarded.
+
+    :param directory: where to keep the pages
+    :param query: url and parameters (except the page) of the query
+    :param total: total number of results AWDE reported
+    """
+
+    def __init__(self, directory: Path, query: dict, total: int):
+        self.directory = directory
+        self._meta = {"query": query, "total": total}
+
+        meta_path = directory / "meta.json"
+        if meta_path.exists() and json.loads(meta_path.read_text()) != self._meta:
+            logger.info(f"Discarding outdated checkpoint {directory}")
+            self.clear()
+
+        directory.mkdir(parents=True, exist_ok=True)
+        meta_path.write_text(json.dumps(self._meta))
+
+    def _path(self, page: int) -> Path:
+        return self.directory / f"page-{page}.json"
+
+    def get(self, page: int) -> list:
+        """
+        The results of page, or None if not yet fetched.
+        """
+        path = self._path(page)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def put(self, page: int, data: list) -> None:
+        # write and rename, so that an interruption leaves no half-written page:
+        tmp_path = self._path(page).with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data))
+        os.replace(tmp_path, self._path(page))
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ResponseCache:
+    """
+    The validators (ETag, Last-Modified) of AWDE responses, keyed on URL and
+    parameters, for conditional requests: AWDE answers a request for a page
+    that has not changed since with 304 and no body. The bodies are not kept
+    here; what they held is in the raw data of the Datasets. So validators are
+    only kept once those data are saved: a validator of data that were lost
+    would make AWDE answer 304 for them from then on.
+
+    Validators are held in memory and written behind to a JSON file: once
+    `flush_every` of them are pending, on flush(), or when the process exits.
+    Several processes may share the file: each merges its new validators into
+    what is on file, under a lock.
+    """
+
+    def __init__(self, path: Path, flush_every: int = 500):
+        """
+        :param path: the JSON file
+        :param flush_every: number of pending entries that trigger a write
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self._lock = threading.RLock()
+        self._entries = None
+        # keys of the entries not yet written:
+        self._pending = set()
+
+        atexit.register(self.flush)
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._entries = (
+                        json.loads(self.path.read_text()) if self.path.exists() else {}
+                    )
+        return self._entries
+
+    @staticmethod
+    def _key(url: str, params: dict) -> str:
+        return url + "?" + urlencode(sorted((k, str(v)) for k, v in params.items()))
+
+    def headers(self, url: str, params: dict) -> dict:
+        """
+        The headers that make a request for url and params conditional.
+        """
+        entry = self._load().get(self._key(url, params), {})
+        headers = {}
+        if "etag" in entry:
+            headers["If-None-Match"] = entry["etag"]
+        if "last_modified" in entry:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def result(self, url: str, params: dict) -> dict:
+        """
+        The paging information (meta.result) of the cached response.
+        """
+        return self._load()[self._key(url, params)]["result"]
+
+    def validators(
+        self, url: str, params: dict, response: requests.Response, result: dict
+    ) -> dict:
+        """
+        The validators of response, if it has any, and its paging information,
+        as update() takes them.
+        """
+        entry = {
+            name: response.headers[header]
+            for name, header in [("etag", "ETag"), ("last_modified", "Last-Modified")]
+            if header in response.headers
+        }
+        if not entry:
+            return {}
+        entry["result"] = result
+
+        return {self._key(url, params): entry}
+
+    def update(self, validators: dict) -> None:
+        """
+        Keep validators (see validators()), once the data of their responses
+        are saved.
+        """
+        if not validators:
+            return None
+
+        with self._lock:
+            entries = self._load()
+            entries.update(validators)
+            self._pending.update(validators)
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    def flush(self) -> None:
+        """
+        Merge pending validators into the file, replacing it atomically, and
+        take over those that other processes wrote to it in the meantime.
+        """
+        with self._lock:
+            if not self._pending:
+                return None
+
+            with file_lock(self.path.with_suffix(".lock")):
+                entries = (
+                    json.loads(self.path.read_text()) if self.path.exists() else {}
+                )
+                entries.update({key: self._entries[key] for key in self._pending})
+
+                tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+                tmp_path.write_text(json.dumps(entries))
+                os.replace(tmp_path, self.path)
+
+            self._entries = entries
+            logger.info(f"Wrote {len(self._pending)} validators to {self.path.name}.")
+            self._pending = set()
+
+
+response_cache = ResponseCache(http_cache)
+
+
+def _in_order(fn, items, workers: int):
+    """
+    Apply fn to items on up to `workers` threads and yield the results in the
+    order of items. Only `workers` results are computed ahead of the consumer,
+    so a slow consumer holds back the requests instead of piling up results.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def query_pages(
     url: str,
     endpoint: str,
     params: dict,
     page: int = 0,
     pager_limit: int = 1000,
     total: int = None,
-) -> list:
+    workers: int = 1,
+    checkpoint: Path = None,
+    cache: ResponseCache = None,
+    if_modified: bool = False,
+    validators: dict = None,
+) -> Iterator[list]:
     """
-    Query the endpoint, get > 1000 results if there are. This is not much more than
-    a wrapper around the requests.get() function. It adds repeated requests if the
-    available data are large enough to be paged.
+    Query the endpoint page by page. The first page is requested right away; it
+    tells us how many results there are. The results of all pages, the first
+    included, are then yielded one page at a time and in page order, while up to
+    `workers` pages are requested ahead over the shared session.
 
     :param url: the url to query
     :param endpoint: the endpoint
@@ -31,47 +428,478 @@ def query_all(
     :param page: page number if results are many. If results are few, stays 0 and can be ignored.
     :param pager_limit: number of results per page.
     :param total: max. number of results. If None (default), request all of them.
+    :param workers: max. number of pages requested at the same time.
+    :param checkpoint: directory to keep pages in until all are there, if there is
+        more than one; an interrupted query with the same checkpoint resumes from it.
+    :param cache: where to keep the validators of the responses (see ResponseCache).
+    :param if_modified: ask AWDE with conditional requests whether the pages have
+        changed since they were cached, and return None if none has. If any has,
+        the pages that have not are requested again in full.
+    :param validators: dict to collect the validators of the responses in instead
+        of keeping them in cache right away; pass them to cache.update() once the
+        results are saved.
+    :return: iterator over the results of each page, or None if not modified.
     """
     params["page"] = page
     params["pager_limit"] = (
-        total if total is None or total < pager_limit else pager_limit
+        total if total is not None and total < pager_limit else pager_limit
     )
+    if_modified = if_modified and cache is not None
 
-    response = requests.get(url + endpoint, params=params)
-    response.raise_for_status()  # Raise an error for bad responses
-    response_dict = json.loads(response.text)
+    def _pages(r: dict) -> range:
+        limit = total if total is not None else r["total"]
+        last_page = math.ceil(limit / int(r["results_per_page"])) - 1
+        return range(int(r["page"]) + 1, last_page + 1)
 
-    result_list = response_dict["data"]
-    r = response_dict["meta"]["result"]
+    fetched = {}
+    response_dict = _get_page(
+        url + endpoint,
+        params,
+        cache=cache,
+        conditional=if_modified,
+        validators=validators,
+    )
+
+    if response_dict is None:
+        # the first page has not changed, and neither has the total; has any other?
+        pages = _pages(cache.result(url + endpoint, params))
+        revalidated = _in_order(
+            lambda page: _get_page(
+                url + endpoint,
+                {**params, "page": page},
+                cache=cache,
+                conditional=True,
+                validators=validators,
+            ),
+            pages,
+            workers,
+        )
+        fetched = {
+            page: response["data"]
+            for page, response in zip(pages, revalidated)
+            if response is not None
+        }
+        if not fetched:
+            logger.info(f"Not modified: {endpoint} {params}")
+            return None
+        response_dict = _get_page(
+            url + endpoint, params, cache=cache, validators=validators
+        )
 
+    r = response_dict["meta"]["result"]
     nrow_awde = r["total"]
     limit = total if total is not None else nrow_awde
     done = int(r["page"]) * int(r["results_per_page"]) + int(r["count"])
 
-    while done < limit:
+    # the remaining pages are known now:
+    pages = _pages(r) if done < limit else range(0)
 
-        params["page"] += 1
+    pages_on_disk = None
+    if checkpoint is not None and len(pages) > 0:
+        # parameters as requests sends them, as str; that also keeps values such as
+        # dates or numpy ints, which JSON cannot take, out of the checkpoint:
+        query = {
+            "url": url + endpoint,
+            "params": {k: str(v) for k, v in params.items() if k != "page"},
+        }
+        pages_on_disk = PageCheckpoint(checkpoint, query, nrow_awde)
+        missing = [p for p in pages if pages_on_disk.get(p) is None]
+        if len(missing) < len(pages):
+            logger.info(
+                f"Resuming {endpoint}: {len(pages) - len(missing)} of "
+                f"{len(pages)} pages from {checkpoint}"
+            )
 
-        response = requests.get(url + endpoint, params=params)
-        response.raise_for_status()
-        response_dict = json.loads(response.text)
+    def _get_data(page: int) -> list:
+        if page in fetched:
+            return fetched.pop(page)
+        if pages_on_disk is not None:
+            data = pages_on_disk.get(page)
+            if data is not None:
+                return data
+        data = _get_page(
+            url + endpoint,
+            {**params, "page": page},
+            cache=cache,
+            validators=validators,
+        )["data"]
+        if pages_on_disk is not None:
+            pages_on_disk.put(page, data)
+        return data
 
-        this_result_list = response_dict["data"]
-        result_list += this_result_list
+    def _iter_pages() -> Iterator[list]:
+        yield response_dict.pop("data")
+        yield from _in_order(_get_data, pages, workers)
+
+        if len(pages) > 0:
+            params["page"] = pages[-1]
+        if pages_on_disk is not None:
+            pages_on_disk.clear()
+
+    return _iter_pages()
 
-        r = response_dict["meta"]["result"]
-        done = int(r["page"]) * int(r["results_per_page"]) + int(r["count"])
+
+def query_all(
+    url: str,
+    endpoint: str,
+    params: dict,
+    page: int = 0,
+    pager_limit: int = 1000,
+    total: int = None,
+    workers: int = 1,
+    checkpoint: Path = None,
+    cache: ResponseCache = None,
+    if_modified: bool = False,
+    validators: dict = None,
+) -> list:
+    """
+    Query the endpoint, get > 1000 results if there are. This is not much more than
+    a wrapper around the requests.get() function. It adds repeated requests if the
+    available data are large enough to be paged.
+
+    Takes the same arguments as query_pages(), and returns the results of all
+    pages in one list, or None if not modified.
+    """
+    pages = query_pages(
+        url,
+        endpoint,
+        params,
+        page=page,
+        pager_limit=pager_limit,
+        total=total,
+        workers=workers,
+        checkpoint=checkpoint,
+        cache=cache,
+        if_modified=if_modified,
+        validators=validators,
+    )
+    if pages is None:
+        return None
+
+    result_list = []
+    for this_result_list in pages:
+        result_list += this_result_list
 
     return result_list
 
 
+# Arrow schemas of the raw data of each AWDE endpoint, with the fields the app
+# uses. Pages are converted to these as they arrive; other fields are dropped.
+_entity = pa.struct(
+    [("id", pa.int64()), ("entity_type", pa.string()), ("label", pa.string())]
+)
+awde_schemas = {
+    "parliament-periods": pa.schema(
+        [
+            ("id", pa.int64()),
+            ("entity_type", pa.string()),
+            ("label", pa.string()),
+            ("api_url", pa.string()),
+            ("type", pa.string()),
+            ("election_date", pa.string()),
+            ("start_date_period", pa.string()),
+            ("end_date_period", pa.string()),
+            ("parliament", _entity),
+            ("previous_period", _entity),
+        ]
+    ),
+    "polls": pa.schema(
+        [
+            ("id", pa.int64()),
+            ("entity_type", pa.string()),
+            ("label", pa.string()),
+            ("api_url", pa.string()),
+            ("field_accepted", pa.bool_()),
+            ("field_committees", pa.list_(_entity)),
+            ("field_intro", pa.string()),
+            ("field_legislature", _entity),
+            ("field_poll_date", pa.string()),
+            ("field_topics", pa.list_(_entity)),
+        ]
+    ),
+    "votes": pa.schema(
+        [
+            ("id", pa.int64()),
+            ("entity_type", pa.string()),
+            ("label", pa.string()),
+            ("mandate", _entity),
+            ("fraction", _entity),
+            ("poll", _entity),
+            ("vote", pa.string()),
+            ("reason_no_show", pa.string()),
+            ("reason_no_show_other", pa.string()),
+        ]
+    ),
+}
+
+
+def page_to_table(data: list, schema: pa.Schema = None) -> pa.Table:
+    """
+    Convert the results of one page to Arrow. Empty lists, which AWDE sends
+    for e.g. polls without topics, become nulls.
+
+    :param data: the results, a list of dicts
+    :param schema: the schema to convert to; inferred from data if None
+    """
+    table = pa.Table.from_pylist(data, schema=schema)
+
+    columns = []
+    for column in table.columns:
+        if pa.types.is_list(column.type) and len(column) > 0:
+            lists = column.combine_chunks()
+            empty = pc.or_kleene(
+                pc.equal(pc.list_value_length(lists), 0), lists.is_null()
+            )
+            column = pa.ListArray.from_arrays(lists.offsets, lists.values, mask=empty)
+        columns.append(column)
+
+    return pa.Table.from_arrays(columns, schema=table.schema)
+
+
+class RawStore:
+    """
+    Keeps the raw data of many small Datasets of one endpoint (e.g. the votes of
+    each poll) in a few Parquet files instead of one file per Dataset.
+
+    Each file ("segment") holds one row group per Dataset. An index file maps
+    Dataset names to (segment, row group), so reading one Dataset is one seek into
+    an already opened file. Saved Datasets are buffered and written as a new
+    segment on flush(); existing segments are never changed, only merged by
+    compact(). Several processes may write to one store: the index is updated under
+    a lock on index.lock, merged with what the others wrote.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._index_path = directory / "index.json"
+        self._index_lock = directory / "index.lock"
+        self._index = self._read_index()
+        self._pending = {}
+        # {name: callable} of the pending Datasets, see append():
+        self._on_flush = {}
+        self._files = {}
+        self._lock = threading.RLock()
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._pending or name in self._index
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index.keys() | self._pending.keys())
+
+    def _read_index(self) -> dict:
+        if self._index_path.exists():
+            return json.loads(self._index_path.read_text())
+        return {}
+
+    def _write_index(self) -> None:
+        # write and rename, so that readers never see a half-written index:
+        tmp_path = self._index_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(self._index))
+        os.replace(tmp_path, self._index_path)
+
+    def _segment(self, segment: str) -> pq.ParquetFile:
+        if segment not in self._files:
+            self._files[segment] = pq.ParquetFile(self.directory / segment)
+        return self._files[segment]
+
+    def read(self, name: str) -> pd.DataFrame:
+        """
+        Return the raw data stored under name, or None if there are none.
+        """
+        with self._lock:
+            if name in self._pending:
+                return self._pending[name]
+            if name not in self._index:
+                return None
+            segment, row_group = self._index[name]
+            table = self._segment(segment).read_row_group(row_group)
+
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def read_many(self, names: list) -> dict:
+        """
+        Return the raw data of many Datasets, {name: DataFrame}, leaving out
+        those not in the store. The row groups of each segment are read in one
+        go and then split up.
+        """
+        out = {}
+        by_segment = {}
+        with self._lock:
+            for name in names:
+                if name in self._pending:
+                    out[name] = self._pending[name]
+                elif name in self._index:
+                    segment, row_group = self._index[name]
+                    by_segment.setdefault(segment, []).append((name, row_group))
+
+            for segment, entries in by_segment.items():
+                file = self._segment(segment)
+                row_groups = [row_group for _, row_group in entries]
+                df = file.read_row_groups(row_groups).to_pandas(
+                    types_mapper=pd.ArrowDtype
+                )
+                offset = 0
+                for name, row_group in entries:
+                    num_rows = file.metadata.row_group(row_group).num_rows
+                    out[name] = _rows(df, offset, num_rows)
+                    offset += num_rows
+
+        return out
+
+    def num_rows(self, name: str) -> int:
+        """
+        Number of rows stored under name, from the segment's metadata; None if
+        there are none.
+        """
+        with self._lock:
+            if name in self._pending:
+                return len(self._pending[name])
+            if name not in self._index:
+                return None
+            segment, row_group = self._index[name]
+            return self._segment(segment).metadata.row_group(row_group).num_rows
+
+    def append(self, name: str, data: pd.DataFrame, on_flush: Callable = None) -> None:
+        """
+        Buffer raw data under name until the next flush().
+
+        :param on_flush: called once the data are written, e.g. to keep what
+            depends on them having been saved
+        """
+        with self._lock:
+            self._pending[name] = data
+            if on_flush is not None:
+                self._on_flush[name] = on_flush
+            else:
+                self._on_flush.pop(name, None)
+
+    def flush(self) -> None:
+        """
+        Write all buffered Datasets into a new segment.
+        """
+        with self._lock:
+            if not self._pending:
+                return None
+            tables = {
+                name: pa.Table.from_pandas(df, preserve_index=False)
+                for name, df in self._pending.items()
+            }
+            entries = self._write_segment(tables)
+
+            # other processes may have added to the index in the meantime:
+            with file_lock(self._index_lock):
+                self._index = {**self._read_index(), **entries}
+                self._write_index()
+            self._pending = {}
+
+            on_flush, self._on_flush = self._on_flush, {}
+            for callback in on_flush.values():
+                callback()
+
+    def _write_segment(self, tables: dict) -> dict:
+        """
+        Write tables, {name: pa.Table}, into a new segment, one row group each.
+
+        :return: the index entries of the tables, {name: [segment, row group]}
+        """
+        # Datasets of one endpoint may differ in inferred types, e.g. a column
+        # that is all null in one of them. Bring all to one common schema:
+        schema = pa.unify_schemas(
+            [t.schema.remove_metadata() for t in tables.values()],
+            promote_options="permissive",
+        )
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        segment = f"segment-{uuid.uuid4().hex}.parquet"
+        entries = {}
+        with pq.ParquetWriter(self.directory / segment, schema) as writer:
+            for row_group, (name, table) in enumerate(tables.items()):
+                writer.write_table(
+                    _conform_table(table, schema),
+                    row_group_size=max(table.num_rows, 1),
+                )
+                entries[name] = [segment, row_group]
+
+        logger.info(f"Wrote {len(tables)} datasets to {self.directory / segment}")
+        return entries
+
+    def compact(self, loose_files: list = ()) -> None:
+        """
+        Merge all segments into one, and move the given single-Dataset Parquet
+        files (as written by Dataset.save() without a store) into it. The loose
+        files are named after their Dataset and deleted once migrated.
+
+        :param loose_files: paths of Parquet files to migrate
+        """
+        with self._lock:
+            self.flush()
+
+            # no other process may add to the index until it is replaced:
+            with file_lock(self._index_lock):
+                self._index = self._read_index()
+
+                tables = {}
+                for name, (segment, row_group) in self._index.items():
+                    tables[name] = self._segment(segment).read_row_group(row_group)
+                for path in loose_files:
+                    tables[Path(path).stem] = pq.read_table(path)
+
+                if not tables:
+                    return None
+
+                old_segments = {segment for segment, _ in self._index.values()}
+                self._index = self._write_segment(tables)
+                self._write_index()
+
+            self._files = {}
+            for segment in old_segments:
+                (self.directory / segment).unlink(missing_ok=True)
+            for path in loose_files:
+                Path(path).unlink()
+
+        logger.info(
+            f"Compacted {len(tables)} datasets, {len(loose_files)} of them "
+            f"from single files, into {self.directory}"
+        )
+
+
+def _rows(df: pd.DataFrame, offset: int, num_rows: int) -> pd.DataFrame:
+    """
+    The rows offset to offset + num_rows of df, indexed from 0, without copying.
+    """
+    rows = df.iloc[offset : offset + num_rows]
+    rows.index = pd.RangeIndex(num_rows)
+    return rows
+
+
+def _conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Order, complete and cast the columns of table to match schema.
+    """
+    columns = [
+        (
+            table.column(f.name).cast(f.type)
+            if f.name in table.column_names
+            else pa.nulls(table.num_rows, f.type)
+        )
+        for f in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
 @dataclass
 class Dataset:
     """
     Represents a dataset as offered at abgeordnetenwatch.
-    Field rawdata, if changed, updates data, which in turn updates nrow. Also, when the transformation
-    function is set, it updates data. So Dataset always represents a consistent combination of raw and
-    processed data and metadata.
+    Data are loaded lazily: creating a Dataset only looks up whether its raw data are
+    cached, and nrow comes from the Parquet metadata. Raw data are read when first
+    used, and data, the raw data run through transform_data, are computed when first
+    used and kept until raw data or transformation change. So Dataset always
+    represents a consistent combination of raw and processed data and metadata.
+    Raw data are backed by Arrow (pd.ArrowDtype), so nested AWDE entities stay struct and list
+    columns that transformations can flatten with pyarrow.compute.
     """
 
     name: str
@@ -80,21 +908,44 @@ class Dataset:
     awde_params: dict = field(default_factory=dict)
     # awde_nrow: int = field(init=False, default=None)
     filepath: Path = None
+    store: RawStore = None
     _rawdata: pd.DataFrame = field(init=False, default=None)
     _data: pd.DataFrame = field(init=False, default=None)
-    _nrow: int = field(init=False, default=None)
+    # validators of the fetched raw data, kept in the ResponseCache on save():
+    _validators: dict = field(init=False, default_factory=dict)
 
     @property
     def rawdata(self):
+        if self._rawdata is None and self.filepath is not None:
+            self._load_rawdata()
         return self._rawdata
 
     @property
     def data(self):
+        if self._data is None and self.rawdata is not None:
+            self._data = self.transform_data(self.rawdata)
         return self._data
 
     @property
     def nrow(self):
-        return self._nrow
+        if self._data is not None:
+            return len(self._data)
+        if self._rawdata is not None:
+            return len(self._rawdata)
+        if self.store is not None and self.name in self.store:
+            return self.store.num_rows(self.name)
+        if self.filepath is not None and self.filepath.is_file():
+            return pq.read_metadata(self.filepath).num_rows
+        return None
+
+    @property
+    def cached(self) -> bool:
+        """
+        Whether raw data are kept locally (or in the store, pending its flush).
+        """
+        if self.store is not None and self.name in self.store:
+            return True
+        return self.filepath is not None and self.filepath.is_file()
 
     @property
     def transform_data(self):
@@ -103,42 +954,109 @@ class Dataset:
     @data.setter
     def data(self, value):
         self._data = value
-        self._nrow = len(value) if value is not None else None
 
     @rawdata.setter
     def rawdata(self, value):
         self._rawdata = value
-        self.data = self.transform_data(value) if value is not None else None
+        self._data = None
+        self._validators = {}
 
     @transform_data.setter
     def transform_data(self, value):
         self._transform_data = value
-        self.data = (
-            self.transform_data(self.rawdata) if self.rawdata is not None else None
-        )
+        self._data = None
 
     def __post_init__(self):
-        self._load_rawdata()
+        # set filepath for cache from name, if cached in the store or the local file:
+        filepath = data_dir / f"{self.name}.parquet"
+        if self.store is not None and self.name in self.store:
+            self.filepath = self.store.directory
+        elif filepath.exists():
+            self.filepath = filepath
+        else:
+            self.filepath = None
         # Get nrow from awde
         # self.awde_nrow = self.get_awde_nrow()
 
     def _load_rawdata(self):
-        # set filepath for cache from name:
-        filepath = dashapp_rootdir / "data" / f"{self.name}.parquet"
-        # Attempt to load data from the local file,
-        # set data if possible, set nrow if possible:
-        if filepath.exists():
-            self.filepath = filepath
-            self.rawdata = pd.read_parquet(self.filepath)
+        # Attempt to load data from the store or the local file:
+        if self.store is not None and self.name in self.store:
+            self._rawdata = self.store.read(self.name)
+            logger.info(f"Loaded data from store: {self.name}")
+        elif self.filepath.is_file():
+            self._rawdata = pq.read_table(self.filepath, memory_map=True).to_pandas(
+                types_mapper=pd.ArrowDtype
+            )
             logger.info(f"Loaded data from cache: {self.filepath}")
-        else:
-            self.filepath = None
-            self.rawdata = None
+
+    @classmethod
+    def load_all(cls, datasets: list) -> None:
+        """
+        Load the raw data of many cached Datasets of one endpoint at once: those in
+        a store with one read per store segment, those in single files with one
+        multi-file read. Datasets that are not cached or already loaded are left
+        as they are.
+
+        :param datasets: list of Datasets
+        """
+        to_load = [d for d in datasets if d._rawdata is None and d.filepath is not None]
+
+        in_stores = {}
+        in_files = []
+        for dataset in to_load:
+            if dataset.store is not None and dataset.name in dataset.store:
+                in_stores.setdefault(id(dataset.store), []).append(dataset)
+            elif dataset.filepath.is_file():
+                in_files.append(dataset)
+
+        for stored in in_stores.values():
+            rawdata = stored[0].store.read_many([d.name for d in stored])
+            for dataset in stored:
+                dataset.rawdata = rawdata[dataset.name]
+
+        if in_files:
+            files = ds.dataset([d.filepath for d in in_files], format="parquet")
+            fragments = list(files.get_fragments())
+            # files may differ in inferred types, e.g. a column that is all null:
+            schema = pa.unify_schemas(
+                [f.physical_schema.remove_metadata() for f in fragments],
+                promote_options="permissive",
+            )
+            df = (
+                files.replace_schema(schema)
+                .to_table()
+                .to_pandas(types_mapper=pd.ArrowDtype)
+            )
+
+            # fragments and rows come in the order of the files:
+            offset = 0
+            for dataset, fragment in zip(in_files, fragments):
+                num_rows = fragment.metadata.num_rows
+                dataset.rawdata = _rows(df, offset, num_rows)
+                offset += num_rows
+
+        logger.info(
+            f"Loaded {len(to_load)} datasets, {len(in_files)} of them from single files"
+        )
 
     def save(self):
-        # Save the dataframe to the local file
-        if self.rawdata is not None:
-            self.rawdata.to_parquet(self.filepath, index=False)
+        # Save the dataframe to the store (on its next flush) or the local file;
+        # the validators of fetched data are kept once they are written:
+        if self.rawdata is None:
+            return None
+        validators, self._validators = self._validators, {}
+        if self.store is not None:
+            self.store.append(
+                self.name,
+                self.rawdata,
+                on_flush=lambda: response_cache.update(validators),
+            )
+            self.filepath = self.store.directory
+        else:
+            # without pandas metadata, which cannot describe nested Arrow types:
+            table = pa.Table.from_pandas(self.rawdata, preserve_index=False)
+            pq.write_table(table.replace_schema_metadata(), self.filepath)
+            response_cache.update(validators)
 
     def get_awde_nrow(self):  # disused
         # find out how many datapoints exist at abgeordnetenwatch for this endpoint
@@ -152,44 +1070,103 @@ class Dataset:
         nrow = metadata["result"]["total"]
         return nrow
 
-    def fetch(self, total: int = None):
+    def fetch(
+        self,
+        total: int = None,
+        workers: int = awde_workers,
+        if_modified: bool = False,
+        save: bool = False,
+    ) -> bool:
         """
-        Fetch data from AWDE.
+        Fetch data from AWDE. Each page is converted to Arrow as it arrives (see
+        page_to_table()), so no more than a few pages are held as Python objects.
+
+        :param total: max. number of results. If None (default), fetch all of them.
+        :param workers: max. number of pages requested at the same time.
+        :param if_modified: if there are data already, ask AWDE whether they changed
+            since they were fetched (see ResponseCache), and keep them if not.
+        :param save: keep the data, as save() would. Without a store, pages are
+            written to the cache file as they arrive, and rawdata is read from it
+            when first needed.
+        :return: whether data were fetched; False if they were not modified.
         """
-        response = query_all(
-            self.awde_url, self.awde_endpoint, params=self.awde_params, total=total
+        validators = {}
+        pages = query_pages(
+            self.awde_url,
+            self.awde_endpoint,
+            params=self.awde_params,
+            total=total,
+            workers=workers,
+            checkpoint=checkpoint_dir / self.name,
+            cache=response_cache,
+            if_modified=if_modified and self.cached,
+            validators=validators,
         )
-        self.filepath = dashapp_rootdir / "data" / f"{self.name}.parquet"
+        if pages is None:
+            return False
+        self.filepath = data_dir / f"{self.name}.parquet"
+        schema = awde_schemas.get(self.awde_endpoint)
 
-        # sometimes values are [], which makes Arrow choke. Replace with None:
-        def _noneify_empty_lists(value):
-            if isinstance(value, list) and len(value) == 0:
-                return None
-            return value
+        if save and self.store is None:
+            # write next to the cache file and move in place when complete:
+            tmp_path = self.filepath.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.parent.mkdir(parents=True, exist_ok=True)
+            writer = None
+            try:
+                for data in pages:
+                    table = page_to_table(data, schema)
+                    if writer is None:
+                        schema = table.schema
+                        writer = pq.ParquetWriter(tmp_path, schema)
+                    writer.write_table(table)
+            except BaseException:
+                if writer is not None:
+                    writer.close()
+                tmp_path.unlink(missing_ok=True)
+                raise
+            if writer is None:
+                raise ValueError(f"AWDE returned no pages for {self.name}")
+            writer.close()
+            os.replace(tmp_path, self.filepath)
+            response_cache.update(validators)
+            # loaded from the cache file when needed (see rawdata):
+            self.rawdata = None
+            return True
+
+        tables = []
+        for data in pages:
+            tables.append(page_to_table(data, schema))
+            schema = tables[0].schema
+        table = pa.concat_tables(tables)
 
-        response = pd.DataFrame(response).map(_noneify_empty_lists)
-        self.rawdata = pd.DataFrame(response)
+        self.rawdata = table.to_pandas(types_mapper=pd.ArrowDtype)
+        self._validators = validators
+        if save and self.store is not None:
+            self.save()
+        return True
 
     def _transform_data(self, data: pd.DataFrame) -> pd.DataFrame:
         # Default implementation (no transformation)
         return data
 
     def __repr__(self):
-        out = f"<{'Empty ' if self.data is None else ''}Dataset '{self.name}'"
-        if self.nrow is not None:
-            out += f"; {self.nrow} rows"
+        nrow = self.nrow
+        out = f"<{'Empty ' if nrow is None else ''}Dataset '{self.name}'"
+        if nrow is not None:
+            out += f"; {nrow} rows"
         if self.filepath is not None:
             out += f"; cached"
         else:
             out += "; uncached"
-        if self.data is not None:
-            out += f"; {len(self.data.columns)} columns."
+        if self._data is not None:
+            out += f"; {len(self._data.columns)} columns."
         out += ">"
 
         return out
 
     def __str__(self):
-        out = f"{'Empty ' if self.data is None else ''}Dataset '{self.name}':\n"
+        nrow = self.nrow
+        out = f"{'Empty ' if nrow is None else ''}Dataset '{self.name}':\n"
         out += f"'{self.awde_url + self.awde_endpoint}'\n"
         out += "params: {"
         for k, v in self.awde_params.items():
@@ -197,8 +1174,8 @@ class Dataset:
         if len(self.awde_params) > 0:
             out += "\n\t"
         out += "}\n"
-        if self.nrow is not None:
-            out += f"nrow cached: {self.nrow}; "
+        if nrow is not None:
+            out += f"nrow cached: {nrow}; "
         # out += f"nrow at awde if unfiltered: {self.awde_nrow}\n"
         if self.filepath is not None:
             out += f"cache file location: {self.filepath.relative_to(Path().cwd())}\n"
@@ -0,0 +1,68 @@
+import logging
+import threading
+from dataclasses import dataclass
+
+import pandas as pd
+
+from bundestag.src.viz.selection_index import SelectionIndex
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class VoteData:
+    """
+    Everything the dashboard callbacks need from the dataset, loaded together.
+    """
+
+    data: pd.DataFrame
+    legislature_labels: dict
+    dataset_version: int
+    selection_index: SelectionIndex
+
+
+class DataHolder:
+    """
+    Holds the data of a dashboard, which may still be loading in the background.
+    Callbacks read `current` once and use that VoteData throughout; new data
+    replace it as a whole, so no callback ever sees a mix of old and new data.
+    """
+
+    def __init__(self):
+        self.current: VoteData = None
+        self.state = "loading"
+        self.error = None
+        self._lock = threading.Lock()
+
+    def set(self, vote_data: VoteData) -> None:
+        """
+        Swap in newly loaded data.
+        """
+        with self._lock:
+            self.current = vote_data
+            self.state = "ready"
+            self.error = None
+
+    def fail(self, error: Exception) -> None:
+        """
+        Record that loading failed. Data loaded before, if any, stay in use.
+        """
+        with self._lock:
+            self.state = "ready" if self.current is not None else "failed"
+            self.error = repr(error)
+
+    @property
+    def ready(self) -> bool:
+        return self.current is not None
+
+    def status(self) -> dict:
+        """
+        State of the data for the readiness route.
+        """
+        status = {"state": self.state}
+        if self.current is not None:
+            status["dataset_version"] = self.current.dataset_version
+            status["votes"] = len(self.current.data)
+        if self.error is not None:
+            status["error"] = self.error
+        return status
@@ -0,0 +1,25 @@
+import fcntl
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def file_lock(path: Path):
+    """
+    Hold an exclusive lock across processes (and threads) while in the block, e.g.
+    to read, merge and rewrite a file that several processes write to. The lock is
+    released when the block is left or the process ends.
+
+    :param path: the lock file; created, with its directory, if missing
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
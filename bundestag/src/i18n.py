@@ -1,13 +1,20 @@
 import os
 import json
+import atexit
 import logging
+import threading
+from functools import cache
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv, find_dotenv
 import deepl
 
 from bundestag.config import language_codes as code
+from bundestag.config import deepl_batch_size, deepl_retries, deepl_workers
+from .file_lock import file_lock
 from .language_context import language_context
 
 
@@ -15,10 +22,135 @@ load_dotenv(find_dotenv(), override=True)
 logger = logging.getLogger(__name__)
 dashapp_rootdir = Path(__file__).resolve().parents[2]
 
-# make the dictionary available to the whole app, so not each and every
-# string that gets translated at app init triggers loading the json data:
 dictionary_path = dashapp_rootdir / "i18n" / "dictionary.json"
-multiling_dictionary = json.loads(dictionary_path.read_text())
+
+
+class TranslationMemory:
+    """
+    Process-wide translation memory backed by the multilingual dictionary
+    {"lorem": {"EN-GB": "ipsum", ...}, ...} in a JSON file.
+
+    The file is read once; lookups go to one flat dict per language. New
+    translations are held in memory and written behind to the file: once
+    `flush_every` of them are pending, `flush_delay` seconds after the first
+    of them came in, or when the process exits. Several processes may share the
+    file: each merges its new translations into what is on file, under a lock.
+    """
+
+    def __init__(self, path: Path, flush_every: int = 50, flush_delay: float = 5.0):
+        """
+        :param path: the JSON dictionary file
+        :param flush_every: number of pending entries that trigger a write
+        :param flush_delay: seconds after which pending entries get written
+        """
+        self.path = path
+        self._lock_path = path.with_suffix(".lock")
+        self.flush_every = flush_every
+        self.flush_delay = flush_delay
+        self._lock = threading.RLock()
+        self._entries = None
+        self._languages = {}
+        # new translations, not yet written: {(text, tgt): translation}
+        self._pending = {}
+        self._timer = None
+
+        atexit.register(self.flush)
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._entries = (
+                        json.loads(self.path.read_text()) if self.path.exists() else {}
+                    )
+                    logger.info(
+                        f"Loaded {len(self._entries)} dictionary entries "
+                        f"from {self.path.name}."
+                    )
+        return self._entries
+
+    def language(self, tgt: str) -> dict:
+        """
+        All translations into one language, {"lorem": "ipsum", ...}. The dict
+        is shared; don't modify it.
+
+        :param tgt: the target language as DeepL code, e.g. "EN-GB"
+        """
+        if tgt not in self._languages:
+            entries = self._load()
+            with self._lock:
+                self._languages[tgt] = {
+                    k: v[tgt] for k, v in entries.items() if tgt in v
+                }
+        return self._languages[tgt]
+
+    def get(self, text: str, tgt: str) -> str:
+        """
+        Translation of text into tgt, None if there is none yet.
+        """
+        return self.language(tgt).get(text)
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._load()
+
+    def add(self, text: str, tgt: str, translation: str) -> None:
+        """
+        Store a new translation and schedule it for writing to the file.
+        """
+        entries = self._load()
+        with self._lock:
+            entries.setdefault(text, {})[tgt] = translation
+            self.language(tgt)[text] = translation
+            self._pending[(text, tgt)] = translation
+
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """
+        Merge pending translations into the file, and take over those that
+        other processes wrote to it in the meantime. The file is replaced
+        atomically, so readers never see a half-written dictionary.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if not self._pending:
+                return
+
+            with file_lock(self._lock_path):
+                entries = (
+                    json.loads(self.path.read_text()) if self.path.exists() else {}
+                )
+                for (text, tgt), translation in self._pending.items():
+                    entries.setdefault(text, {})[tgt] = translation
+
+                tmp_path = self.path.with_suffix(".tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(entries, f, indent=4, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+
+            for text, translations in entries.items():
+                known = self._entries.setdefault(text, {})
+                for tgt, translation in translations.items():
+                    if tgt not in known:
+                        known[tgt] = translation
+                        if tgt in self._languages:
+                            self._languages[tgt][text] = translation
+
+            logger.info(f"Wrote {len(self._pending)} new entries to {self.path.name}.")
+            self._pending = {}
+
+
+# make the dictionary available to the whole app, so not each and every
+# string that gets translated triggers loading the json data:
+translation_memory = TranslationMemory(dictionary_path)
 
 
 # def get_biling_dictionary(multiling_dictionary, language):
@@ -31,20 +163,21 @@ multiling_dictionary = json.loads(dictionary_path.read_text())
 #     }
 
 
-def get_translations(labels: pd.Series) -> None:
+def get_translations(labels: pd.Series, language: str = None) -> None:
     """
     Check voting labels for presence of their 'tgt_lang' translation in our
     dictionary, and if missing, translate them and store them right there.
     This only ensures presence; for the function that returns translations,
-    see => translate_labels().
+    see => translate_series().
+
+    :param labels: the German strings to translate
+    :param language: the target language; the current language if None
     """
-    current_language = language_context.get_language()
+    current_language = language or language_context.get_language()
 
-    # load label dictionary and set to target language:
-    dictionary_path = dashapp_rootdir / "i18n" / "dictionary.json"
-    dictionary = json.loads(dictionary_path.read_text())
     src = code["de"]
     tgt = code[current_language]
+    dictionary = translation_memory.language(tgt)
     logger.info(f"Dictionary has {len(dictionary)} entries.")
 
     # identify new labels (not in dict or not in the desired language):
@@ -53,36 +186,18 @@ def get_translations(labels: pd.Series) -> None:
 
     # do the translating and put it into the global dictionary:
     if new_labels:
-        auth_key = os.getenv("DEEPL_AUTH_KEY", None)
-        if auth_key:
+        if get_translator() is not None:
             logger.info(f"Translating {len(new_labels)} new labels.")
-            translator = deepl.Translator(auth_key)
             # new_entries: {"lorem": "ipsum", ...}
-            new_entries = {
-                key: {
-                    tgt: translator.translate_text(
-                        key, target_lang=tgt, source_lang=src
-                    ).text
-                }
-                for key in new_labels
-            }
+            new_entries = dict(
+                zip(new_labels, translate_batch(new_labels, tgt=tgt, src=src))
+            )
 
             # bring new entries into the dictionary:
             logger.info(f"Adding {len(new_entries)} new entries to the dictionary.")
             for k, v in new_entries.items():
-                if k in dictionary:
-                    # entry exisits, but add this new language:
-                    dictionary[k][tgt] = v
-                else:
-                    # add completely new entry:
-                    dictionary[k] = {tgt: v}
-
-            json.dump(
-                dictionary,
-                open(dictionary_path, "w"),
-                indent=4,
-                ensure_ascii=False,
-            )
+                translation_memory.add(k, tgt, v)
+            translation_memory.flush()
 
         else:
             logger.warning("No DeepL key found. Translations will not be available.")
@@ -90,6 +205,60 @@ def get_translations(labels: pd.Series) -> None:
         logger.info("No new labels found. No translation needed.")
 
 
+@cache
+def get_translator() -> deepl.Translator:
+    """
+    The DeepL client shared by all translation requests, None if there is no
+    DEEPL_AUTH_KEY. DEEPL_SERVER_URL, if set, points it at another server, such
+    as a local stand-in for testing (see benchmarks/deepl_server.py).
+
+    The client retries requests that DeepL throttles (429) or fails (5xx) by
+    itself, with exponential backoff and jitter, up to deepl_retries times.
+    """
+    auth_key = os.getenv("DEEPL_AUTH_KEY", None)
+    if not auth_key:
+        return None
+
+    deepl.http_client.max_network_retries = deepl_retries
+
+    return deepl.Translator(auth_key, server_url=os.getenv("DEEPL_SERVER_URL", None))
+
+
+def translate_batch(
+    texts: list,
+    tgt: str,
+    src: str = code["de"],
+    batch_size: int = deepl_batch_size,
+    workers: int = deepl_workers,
+) -> list:
+    """
+    Translate many texts at DeepL, batch_size texts per request and up to
+    workers requests at a time.
+
+    :param texts: the strings to translate
+    :param tgt: the target language as DeepL code, e.g. "EN-GB"
+    :param src: the source language as DeepL code
+    :param batch_size: number of texts per request
+    :param workers: number of parallel requests
+    :return: list of translations, in the order of texts
+    """
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda batch: _translate(batch, tgt, src), batches)
+
+        return [text for batch in results for text in batch]
+
+
+def _translate(texts: list, tgt: str, src: str) -> list:
+    """
+    One request to DeepL; the client retries it while DeepL throttles us (see
+    get_translator()).
+    """
+    results = get_translator().translate_text(texts, target_lang=tgt, source_lang=src)
+    return [r.text for r in results]
+
+
 def dict2list(dct: dict, key) -> list:
     """
     Turn a dict of the form
@@ -139,43 +308,78 @@ def list2dict(lst: list, key) -> dict:
 
 def load_current_dict(current_language: str = "en") -> dict:
     """
-    Load the master dictionary, bring into simple form:
+    Get the master dictionary in simple form:
     {"lorem": {"en": "ipsum"}, ...} => {"lorem": "ipsum", ...}
     """
-    dictionary_path = dashapp_rootdir / "i18n" / "dictionary.json"
-
     tgt = code[current_language]
 
-    master_dict = json.loads(dictionary_path.read_text())
-    dictionary = {k: v[tgt] for k, v in master_dict.items()}
-
-    return dictionary
+    return dict(translation_memory.language(tgt))
 
 
 def save_current_dict(dictionary, current_language: str = "en") -> None:
     """
-    Restore original dictionary form and save to JSON.
+    Bring a simple-form dictionary into the master dictionary and save it.
     """
-    dictionary_path = dashapp_rootdir / "i18n" / "dictionary.json"
-    
     tgt = code[current_language]
 
-    master_dict = {k: {tgt: v} for k, v in dictionary.items()}
-    json.dump(master_dict, open(dictionary_path, "w"), ensure_ascii=False, indent=4)
+    current = translation_memory.language(tgt)
+    for k, v in dictionary.items():
+        if current.get(k) != v:
+            translation_memory.add(k, tgt, v)
+    translation_memory.flush()
 
 
-def translate_series(series: pd.Series) -> pd.Series:
+def translate_series(
+    series: pd.Series, language: str = None, keep_untranslated: bool = True
+) -> pd.Series:
     """
-    Translate a series of strings into the current language.
+    Translate a series of strings into the current language. Each distinct
+    string is looked up once; categoricals are translated by their categories
+    only.
+
+    :param series: the German strings
+    :param language: the target language; the current language if None
+    :param keep_untranslated: leave strings without translation as they are;
+        if False, they become null
+    :return: the translated series, of the same dtype
     """
-    current_language = language_context.get_language()
+    current_language = language or language_context.get_language()
 
     if current_language == "de":
         return series
-    
-    dictionary = load_current_dict(current_language)
 
-    return series.replace(dictionary)
+    dictionary = translation_memory.language(code[current_language])
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        translated = categories.map(
+            lambda x: dictionary.get(x, x if keep_untranslated else None)
+        )
+
+        # different labels can share a translation, so merge their categories:
+        if translated.is_unique and translated.notna().all():
+            return series.cat.rename_categories(translated)
+
+        new_categories = pd.Index(pd.unique(translated.dropna()))
+        codes = np.append(new_categories.get_indexer(translated), -1)
+        return pd.Series(
+            pd.Categorical.from_codes(
+                codes[series.cat.codes.to_numpy()],
+                categories=new_categories,
+                ordered=series.cat.ordered,
+            ),
+            index=series.index,
+            name=series.name,
+        )
+
+    codes, uniques = pd.factorize(series)
+    translated = np.array(
+        [dictionary.get(x, x if keep_untranslated else None) for x in uniques]
+        + [None],
+        dtype=object,
+    )
+
+    return pd.Series(translated[codes], index=series.index, name=series.name)
 
 
 def translate(text: str) -> str:
@@ -198,16 +402,16 @@ def translate(text: str) -> str:
     if text is None:
         return None
 
-    dictionary = load_current_dict(current_language)
+    tgt = code[current_language]
 
     # if string is in translation memory, return translation:
-    if text in dictionary:
-        translated_text = dictionary.get(text)
-    else:
+    translated_text = translation_memory.get(text, tgt)
+
+    if translated_text is None:
         # if string is missing, get it from DeepL and store in TM:
         translated_text = request_translation(text)
-        dictionary[text] = translated_text
-        save_current_dict(dictionary, current_language)
+        if translated_text is not None:
+            translation_memory.add(text, tgt, translated_text)
 
     if translated_text is None:
         logger.error(
@@ -226,20 +430,14 @@ def request_translation(text: str) -> str:
     """
     current_language = language_context.get_language()
 
-    auth_key = os.getenv("DEEPL_AUTH_KEY", None)
-
-    if auth_key:
+    if get_translator() is not None:
         logger.info(
             f"Requesting translation for '{text[0:30]}"
             f"{'[...]' if len(text) > 30 else ''}'"
         )
-        translator = deepl.Translator(auth_key)
-
-        translated_text = translator.translate_text(
-            text,
-            target_lang=code[current_language],
-            source_lang="DE",
-        ).text
+        (translated_text,) = _translate(
+            [text], tgt=code[current_language], src=code["de"]
+        )
 
     else:
         logger.warning("No DeepL key found. New translations will not be available.")
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+from bundestag.config import figure_cache_size
+
+
+class FigureCache:
+    """
+    Least-recently-used cache for figures. Holds at most maxsize entries; when
+    full, the entry that was requested longest ago is dropped. Counts hits and
+    misses, see info().
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Return the entry for key. If there is none, call build() to make it
+        and store the result.
+
+        :param key: hashable identifier of the entry
+        :param build: function without arguments that returns the entry
+        """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        # build outside of the lock, so other requests are not held up:
+        value = build()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+figure_cache = FigureCache(maxsize=figure_cache_size)
@@ -0,0 +1,129 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from bundestag.src.log_config import setup_logger
+from bundestag.src.viz.visualize import get_points_votes, get_points_dissenters
+
+setup_logger()
+logger = logging.getLogger(__name__)
+
+
+class SelectionIndex:
+    """
+    Positions of every dissenting vote in the two figures of each legislature
+    and fraction.
+
+    A selection in one figure arrives as (trace, point) pairs; the index turns
+    these into vote IDs and the vote IDs into the selectedpoints of each trace
+    in both figures, without going back to the full vote table.
+
+    The positions of a legislature and fraction are computed when first needed,
+    like its figures, and kept.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        """
+        :param data: the vote table the dashboard shows
+        """
+        self._data = data
+
+        # (legislature, fraction) -> df indexed by vote_id with the columns
+        # votes_trace, votes_row, diss_row; and {figure: {trace: vote IDs in
+        # point order}} with figure "votes" or "dissenters":
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, legislature, fraction) -> tuple:
+        key = (legislature, fraction)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+
+        data = self._data
+        grp = data.loc[data.fid_legislatur.eq(legislature) & data.fraction.eq(fraction)]
+        points_votes = get_points_votes(grp)
+        points_diss = get_points_dissenters(grp)
+
+        positions = pd.merge(
+            points_votes.rename(columns={"trace": "votes_trace", "row": "votes_row"}),
+            points_diss[["vote_id", "row"]].rename(columns={"row": "diss_row"}),
+            on="vote_id",
+            how="outer",
+        ).set_index("vote_id")
+
+        vote_ids = {
+            figure: {
+                int(trace): trace_points.vote_id.to_numpy()
+                for trace, trace_points in points.groupby("trace")
+            }
+            for figure, points in [
+                ("votes", points_votes),
+                ("dissenters", points_diss),
+            ]
+        }
+
+        with self._lock:
+            self._entries[key] = (positions, vote_ids)
+        logger.debug(f"Built selection index for {key}")
+
+        return positions, vote_ids
+
+    def resolve(self, legislature, fraction, figure: str, points: list) -> list:
+        """
+        Vote IDs of the points selected in a figure.
+
+        :param legislature: ID of the legislature shown
+        :param fraction: fraction shown
+        :param figure: "votes" or "dissenters"
+        :param points: the "points" of a figure's selectedData
+        :return: list of vote IDs; points not standing for a single vote (the
+            fraction majority bars) are left out, as are points beyond the end of
+            their trace (a selection left over from other figures)
+        """
+        vote_ids = self._entry(legislature, fraction)[1][figure]
+
+        selected = []
+        for p in points:
+            trace = vote_ids.get(p["curveNumber"])
+            if trace is not None and 0 <= p.get("pointIndex", -1) < len(trace):
+                selected.append(int(trace[p["pointIndex"]]))
+
+        return selected
+
+    def selectedpoints(self, legislature, fraction, vote_ids: list = None) -> tuple:
+        """
+        The selectedpoints of each trace of both figures.
+
+        :param legislature: ID of the legislature shown
+        :param fraction: fraction shown
+        :param vote_ids: IDs of selected votes; None if nothing is selected
+        :return: tuple of two dicts {trace index: selected point numbers} for
+            the votes and the dissenters figure; point numbers are None if
+            nothing is selected
+        """
+        positions, vote_ids_by_figure = self._entry(legislature, fraction)
+        vote_traces = vote_ids_by_figure["votes"]
+        diss_traces = vote_ids_by_figure["dissenters"]
+
+        if vote_ids is None:
+            return (
+                {trace: None for trace in vote_traces},
+                {trace: None for trace in diss_traces},
+            )
+
+        # look up only the selected votes; IDs not in this fraction are -1:
+        rows = positions.index.get_indexer(pd.unique(np.asarray(vote_ids)))
+        selected = positions.iloc[rows[rows >= 0]]
+
+        votes = {trace: [] for trace in vote_traces}
+        for trace, grp in selected.dropna(subset="votes_trace").groupby("votes_trace"):
+            votes[int(trace)] = sorted(grp.votes_row.astype(int).tolist())
+
+        dissenters = {trace: [] for trace in diss_traces}
+        if 0 in dissenters:
+            dissenters[0] = sorted(selected.diss_row.dropna().astype(int).tolist())
+
+        return votes, dissenters
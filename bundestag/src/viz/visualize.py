@@ -12,9 +12,101 @@ setup_logger()
 logger = logging.getLogger(__name__)
 
 
-def get_fig_votes(votes_plot, selected_vote_ids: list):
+def get_points_votes(votes_plot) -> pd.DataFrame:
     """
-    Per-fraction * per-legislature figure showing dissent poll-wise.
+    Where the figure made by get_fig_votes() draws each dissenting vote.
+
+    :param votes_plot: the data the figure shows
+    :return: df with columns vote_id, trace (index of the trace in the figure)
+        and row (number of the point within the trace)
+    """
+    # the figure starts with one trace per party line vote option:
+    n_line_traces = (
+        votes_plot.loc[votes_plot.on_party_line].groupby("y").vote.first().nunique()
+    )
+
+    # then come the dissenter votes, one trace per vote option:
+    votes_dissent = votes_plot.loc[~votes_plot.on_party_line]
+    points = [
+        pd.DataFrame(
+            {
+                "vote_id": grp["vote_id"].to_numpy(),
+                "trace": n_line_traces + i,
+                "row": np.arange(len(grp)),
+            }
+        )
+        for i, (vote, grp) in enumerate(votes_dissent.groupby("vote", observed=True))
+    ]
+
+    return pd.concat(points) if points else _no_points()
+
+
+def get_points_dissenters(votes_plot) -> pd.DataFrame:
+    """
+    Where the figure made by get_fig_dissenters() draws each dissenting vote.
+
+    :param votes_plot: the data the figure shows
+    :return: df with columns vote_id, trace (always 0) and row
+    """
+    df_diss = _get_dissenter_grid(votes_plot)
+
+    return pd.DataFrame(
+        {
+            "vote_id": df_diss["vote_id"].to_numpy(),
+            "trace": 0,
+            "row": np.arange(len(df_diss)),
+        }
+    )
+
+
+def _no_points() -> pd.DataFrame:
+    return pd.DataFrame({"vote_id": [], "trace": [], "row": []}, dtype="int64")
+
+
+def _hover_lookup(df: pd.DataFrame, columns: list) -> tuple:
+    """
+    Encode columns of df for the hover labels as indices into lookup tables, so
+    that each distinct value (e.g. the title of a poll) is sent to the browser
+    once per figure instead of once per point. The lookup tables go into the
+    figure's layout.meta, the indices into the customdata of each point and the
+    hover lines into the meta of each trace (see _hover()); assets/hover.js
+    puts them together when a point is hovered.
+
+    :param df: the data the figure shows
+    :param columns: columns shown in the hover labels
+    :return: dict {column: index of each row's value}, as columns to add to df
+        (with a "hover_" prefix); dict {column: list of distinct values}
+    """
+    codes, lookup = {}, {}
+    for column in columns:
+        codes[f"hover_{column}"], uniques = pd.factorize(df[column])
+        lookup[column] = [str(value) for value in uniques]
+
+    return codes, lookup
+
+
+def _hover(df: pd.DataFrame, fields: list, lines: list) -> dict:
+    """
+    Trace properties for hover labels from lookup tables (see _hover_lookup()).
+
+    :param df: the points of the trace, with the hover_ columns
+    :param fields: columns to show
+    :param lines: lines of the hover label, with {column} placeholders; the
+        first line is set in bold
+    """
+    return dict(
+        customdata=df[[f"hover_{field}" for field in fields]].to_numpy(),
+        meta={"fields": fields, "hover": lines},
+        hoverinfo="none",
+    )
+
+
+def get_fig_votes(votes_plot):
+    """
+    Per-fraction * per-legislature figure showing dissent poll-wise. Nothing is
+    selected; selections are patched in (see SelectionIndex).
+
+    :param votes_plot: vote-level data of one fraction in one legislature
     """
     vote_map = {
         "yes": "rgba(0,200,0, .5)",
@@ -22,9 +114,8 @@ def get_fig_votes(votes_plot, selected_vote_ids: list):
         "abstain": "rgba(100,100,100, .5)",
     }
 
-    # logger.info(f"Received vote_ids: {selected_vote_ids}")
-
-    df = votes_plot.copy()
+    codes, lookup = _hover_lookup(votes_plot, ["label", "date", "name", "vote"])
+    df = votes_plot.assign(**codes)
 
     #
     # ranges and panel sizes:
@@ -81,8 +172,7 @@ def get_fig_votes(votes_plot, selected_vote_ids: list):
                     color=vote_map[vote],
                 ),
                 showlegend=False,
-                customdata=grp[["label", "date"]],
-                hovertemplate="%{customdata[0]}<extra></extra>",
+                **_hover(grp, ["label"], ["{label}"]),
             ),
             col=1,
             row=1,
@@ -92,11 +182,6 @@ def get_fig_votes(votes_plot, selected_vote_ids: list):
     # grouped by person (name) and color (yes/no/abs vote):
     for vote, grp in votes_dissent.groupby("vote", observed=True):
 
-        selected_votes_rownum = (
-            (grp["vote_id"].isin(selected_vote_ids)).to_numpy().nonzero()[0].tolist()
-        )
-        logger.info(f"vote '{vote}' selected_votes_rownum: {selected_votes_rownum}")
-
         fig.add_trace(
             go.Bar(
                 orientation="h",
@@ -108,19 +193,18 @@ def get_fig_votes(votes_plot, selected_vote_ids: list):
                     color=vote_map[vote],
                 ),
                 showlegend=False,
-                # customdata=grp.vote_id,
-                customdata=grp.reset_index()[
-                    ["label", "date", "vote", "name", "vote_id"]
-                ],
-                hovertemplate="<b>%{customdata[3]}</b> (%{customdata[1]})<br>%{customdata[0]}<extra>%{customdata[2]}</extra>",
-                selectedpoints=selected_votes_rownum,
+                **_hover(
+                    grp,
+                    ["name", "date", "label", "vote"],
+                    ["{name} ({date})", "{label}", "{vote}"],
+                ),
             ),
             col=3,
             row=1,
         )
 
     # overall result of each vote:
-    for vote, grp in parliament_vote.groupby("parliament_vote"):
+    for vote, grp in parliament_vote.groupby("parliament_vote", observed=True):
 
         fig.add_trace(
             go.Scatter(
@@ -189,6 +273,7 @@ def get_fig_votes(votes_plot, selected_vote_ids: list):
         plot_bgcolor="rgba(0,0,0, 0)",
         paper_bgcolor="rgba(255,255,255, 0)",
         margin=dict(t=100, r=0, b=0, l=0),
+        meta=lookup,
         xaxis3_range=[-0.5, layout_measures["panel3_xmax"]],
         clickmode="event+select",
         dragmode="select",
@@ -208,16 +293,14 @@ def get_fig_votes(votes_plot, selected_vote_ids: list):
         range=[0.5, layout_measures["height"] + 0.5],
     )
 
-    # logger.info(f"just drew frac plot with selection {selected_vote_ids}")
-
     return fig
 
 
-def get_fig_dissenters(votes_plot, selected_vote_ids, language="de"):
+def _get_dissenter_grid(votes_plot) -> pd.DataFrame:
     """
-    Show every MdB who dissented at least once and evey poll with at least one dissenter as a grid.
+    The points of the dissenter figure, in the order they are plotted: one per
+    dissenting vote, y by MdB, x by poll.
     """
-
     df_diss = (
         # look only at dissenting votes:
         votes_plot.loc[~votes_plot.on_party_line]
@@ -228,15 +311,13 @@ def get_fig_dissenters(votes_plot, selected_vote_ids, language="de"):
     )
 
     # fix y-axis sorting by giving explicit row numbers in the plot:
+    # (names may be categorical already; a list keeps this order of categories)
     df_diss.name = pd.Categorical(
-        df_diss.name, ordered=True, categories=df_diss.name.unique()
+        df_diss.name, ordered=True, categories=df_diss.name.drop_duplicates().tolist()
     )
 
-    height = len(df_diss.name.unique())
-
-    #
     label_freq = (
-        df_diss.groupby("label")
+        df_diss.groupby("label", observed=True)
         .size()
         .to_frame("freq")
         .reset_index()
@@ -246,24 +327,33 @@ def get_fig_dissenters(votes_plot, selected_vote_ids, language="de"):
         .rename({"index": "x"}, axis=1)
     )
     df_diss = pd.merge(df_diss, label_freq, how="left", on="label")
-    df_diss.sort_values("x")
 
-    selected_votes_rownum = (
-        (df_diss["vote_id"].isin(selected_vote_ids)).to_numpy().nonzero()[0].tolist()
-    )
+    return df_diss
+
+
+def get_fig_dissenters(votes_plot, language="de"):
+    """
+    Show every MdB who dissented at least once and evey poll with at least one dissenter as a grid.
+    Nothing is selected; selections are patched in (see SelectionIndex).
+
+    :param votes_plot: vote-level data of one fraction in one legislature
+    """
+    df_diss = _get_dissenter_grid(votes_plot)
+    # MdBs are placed on the y-axis by their position in names, which also
+    # labels the axis, so that each name is sent once:
+    names = df_diss.name.cat.categories.tolist()
+    height = len(names)
+
+    codes, lookup = _hover_lookup(df_diss, ["label", "party_line", "vote"])
+    df_diss = df_diss.assign(hover_name=df_diss.name.cat.codes, **codes)
+    lookup["name"] = names
 
     fig = go.Figure()
 
-    hovertemplate = (
-        "<b>%{customdata[0]}</b><br>"
-        + t("zur Abstimmung") + "<br>\"<i>%{customdata[1]}</i>\"<br>"
-        + t("Stimme: ") + "%{customdata[3]}<br>"
-        + t("Fraktionsmehrheit: ") + "%{customdata[2]}.<extra></extra>"
-    )
     fig.add_trace(
         go.Scatter(
             x=df_diss.x,
-            y=df_diss.name,
+            y=df_diss.hover_name,
             mode="markers",
             marker=dict(
                 size=8,
@@ -272,10 +362,17 @@ def get_fig_dissenters(votes_plot, selected_vote_ids, language="de"):
                 line_width=0.5,
                 line_color="white",
             ),
-            selectedpoints=selected_votes_rownum,
-            # customdata=df_diss.vote_id,
-            customdata=df_diss[["name", "label", "party_line", "vote", "vote_id"]],
-            hovertemplate=hovertemplate,
+            **_hover(
+                df_diss,
+                ["name", "label", "party_line", "vote"],
+                [
+                    "{name}",
+                    t("zur Abstimmung"),
+                    '"{label}"',
+                    t("Stimme: ") + "{vote}",
+                    t("Fraktionsmehrheit: ") + "{party_line}.",
+                ],
+            ),
             showlegend=False,
         )
     )
@@ -299,8 +396,12 @@ def get_fig_dissenters(votes_plot, selected_vote_ids, language="de"):
         ),
         yaxis=dict(
             range=[-0.5, height - 0.5],
+            tickmode="array",
+            tickvals=list(range(height)),
+            ticktext=names,
         ),
         margin=dict(t=100, r=0, b=0, l=0),
+        meta=lookup,
         clickmode="event+select",
         dragmode="select",
         newselection_mode="gradual",
@@ -0,0 +1,41 @@
+"""
+Download or update the Bundestag voting data outside of the dashboard, e.g. as a
+nightly job:
+
+    python -m bundestag.update_data --sync
+
+To move raw votes cached by earlier versions as one file per poll into the
+votes store, run once:
+
+    python -m bundestag.update_data --compact
+"""
+
+import argparse
+
+from .src.data.ensure_data import compact_votes_store, ensure_data_bundestag
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download Bundestag voting data from abgeordnetenwatch.de."
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="if data are present, add polls published since the last download",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="merge the raw votes store and move single-poll cache files into it",
+    )
+    args = parser.parse_args()
+
+    if args.compact:
+        compact_votes_store()
+    else:
+        ensure_data_bundestag(sync=args.sync)
+
+
+if __name__ == "__main__":
+    main()
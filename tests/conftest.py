@@ -0,0 +1,94 @@
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# the tests import the app from the repository, and must not touch its local data
+# or AWDE; both are read by bundestag.config when first imported. Nothing listens
+# at AWDE_URL, unless a test serves a stand-in there (see default_awde):
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ["BUNDESTAG_DATA_DIR"] = tempfile.mkdtemp(prefix="bundestag-tests-")
+awde_port = _free_port()
+os.environ["AWDE_URL"] = f"http://127.0.0.1:{awde_port}/api/v2/"
+
+
+class RecordingSource:
+    """
+    Wraps a source of the AWDE stand-in, records the pages requested from it and
+    fails (404) requests for pages from fail_from on, if given.
+    """
+
+    def __init__(self, source, fail_from: int = None):
+        self.source = source
+        self.fail_from = fail_from
+        self.requested = []
+
+    def page(self, endpoint: str, params: dict) -> dict:
+        page = int(params.get("page", 0))
+        self.requested.append((endpoint, page))
+        if self.fail_from is not None and page >= self.fail_from:
+            return None
+        return self.source.page(endpoint, params)
+
+
+@pytest.fixture
+def awde():
+    """
+    Serve a source on a local AWDE stand-in (see benchmarks/awde_server.py):
+    awde(source) returns its URL, and the server's stats are in awde.stats.
+    """
+    from benchmarks.awde_server import serve
+
+    servers = []
+
+    def start(source) -> str:
+        start.stats = {}
+        server, url = serve(source, stats=start.stats)
+        servers.append(server)
+        return url
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture
+def default_awde(tmp_path, monkeypatch):
+    """
+    Serve a source on a local AWDE stand-in at AWDE_URL, where the app's Datasets
+    go by default: default_awde(source); the server's stats are in
+    default_awde.stats. Raw data, checkpoints and validators are kept in tmp_path.
+    """
+    from benchmarks.awde_server import serve
+    from bundestag.src.data import ensure_data, models
+
+    monkeypatch.setattr(models, "data_dir", tmp_path)
+    monkeypatch.setattr(models, "checkpoint_dir", tmp_path / "checkpoints")
+    monkeypatch.setattr(ensure_data, "data_dir", tmp_path)
+    cache = models.ResponseCache(tmp_path / "http_cache.json")
+    monkeypatch.setattr(models, "response_cache", cache)
+    monkeypatch.setattr(ensure_data, "response_cache", cache)
+
+    servers = []
+
+    def start(source) -> None:
+        start.stats = {}
+        server, _ = serve(source, port=awde_port, stats=start.stats)
+        servers.append(server)
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
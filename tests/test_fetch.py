@@ -0,0 +1,35 @@
+import pytest
+import requests
+
+from benchmarks.synthetic import SyntheticAWDE
+from bundestag.src.data.models import Dataset
+from conftest import RecordingSource
+
+
+@pytest.fixture(scope="module")
+def synthetic():
+    # more polls than fit on one page (pager_limit 1000):
+    return SyntheticAWDE(legislatures=1, polls=2500, mdbs=10)
+
+
+def test_failed_fetch_leaves_no_partial_file(awde, synthetic):
+    url = awde(RecordingSource(synthetic, fail_from=2))
+    polls = Dataset(name="polls_failed", awde_endpoint="polls", awde_url=url)
+
+    with pytest.raises(requests.HTTPError):
+        polls.fetch(save=True)
+
+    cache_dir = polls.filepath.parent
+    assert not list(cache_dir.glob("polls_failed.*"))
+
+
+def test_fetch_saves_and_reads_on_demand(awde, synthetic):
+    url = awde(synthetic)
+    polls = Dataset(name="polls_saved", awde_endpoint="polls", awde_url=url)
+
+    assert polls.fetch(save=True)
+
+    assert polls.filepath.is_file()
+    assert polls._rawdata is None
+    assert polls.nrow == len(synthetic.poll_list)
+    assert list(polls.rawdata["id"]) == [p["id"] for p in synthetic.poll_list]
@@ -0,0 +1,73 @@
+import json
+
+import pandas as pd
+import pytest
+
+from bundestag.src import i18n
+from bundestag.src.data.ensure_data import (
+    add_label_translations,
+    load_votes,
+    write_votes,
+)
+
+
+@pytest.fixture
+def memory(tmp_path, monkeypatch):
+    path = tmp_path / "dictionary.json"
+    path.write_text(json.dumps({"Antrag A": {"EN-GB": "Motion A"}}))
+    memory = i18n.TranslationMemory(path)
+    monkeypatch.setattr(i18n, "translation_memory", memory)
+    # no DeepL key:
+    monkeypatch.setattr(i18n, "get_translator", lambda: None)
+    return memory
+
+
+def votes() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "fid_legislatur": [1, 1, 1, 1],
+            "vote_id": [1, 2, 3, 4],
+            "label": ["Antrag A", "Antrag B", "Antrag A", "Antrag B"],
+        }
+    )
+
+
+def test_untranslated_labels_are_stored_as_null(memory):
+    df = add_label_translations(votes())
+
+    assert df.label_en.iloc[0] == "Motion A"
+    assert df.label_en.isna().tolist() == [False, True, False, True]
+
+
+def test_labels_translated_later_reach_the_data(memory, tmp_path):
+    path = tmp_path / "votes"
+    write_votes(add_label_translations(votes()), path)
+
+    # without translation, the German label is shown:
+    assert load_votes(path, language="en").label.tolist() == [
+        "Motion A",
+        "Antrag B",
+        "Motion A",
+        "Antrag B",
+    ]
+
+    # the translation added to the dictionary afterwards is used:
+    memory.add("Antrag B", "EN-GB", "Motion B")
+    df = load_votes(path, language="en")
+    assert df.label.tolist() == ["Motion A", "Motion B", "Motion A", "Motion B"]
+    assert isinstance(df.label.dtype, pd.CategoricalDtype)
+    assert not [c for c in df if c.startswith("label_")]
+
+
+def test_no_label_translated(memory, tmp_path):
+    path = tmp_path / "votes"
+    df = votes().assign(label=["Antrag C", "Antrag D", "Antrag C", "Antrag D"])
+    write_votes(add_label_translations(df), path)
+
+    memory.add("Antrag D", "EN-GB", "Motion D")
+    assert load_votes(path, language="en").label.tolist() == [
+        "Antrag C",
+        "Motion D",
+        "Antrag C",
+        "Motion D",
+    ]
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from bundestag.src.data.ensure_data import add_party_line_metrics, vote_options
+
+
+def reference(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The metrics as computed with groupby before, which leaves out missing keys;
+    party line ties go to the option listed first.
+    """
+    party_line = (
+        df.dropna(subset="vote")
+        .groupby(["fraction", "poll_id"], observed=True)
+        .vote.agg(lambda x: x.value_counts(sort=False).idxmax())
+        .rename("party_line")
+    )
+    df = df.join(party_line, on=["fraction", "poll_id"])
+    df["on_party_line"] = df.vote.eq(df.party_line).fillna(False).astype(bool)
+
+    dissent = df.vote.notna() & ~df.on_party_line
+    n_dissent = dissent.groupby([df.fraction, df.name], observed=True).sum()
+    df["n_dissent"] = (
+        df.join(n_dissent.rename("n_dissent"), on=["fraction", "name"])
+        .n_dissent.fillna(0)
+        .astype(int)
+    )
+
+    unanimity = (
+        df.groupby(["fraction", "poll_id"], observed=True)
+        .on_party_line.sum()
+        .rename("unanimity")
+        .reset_index()
+        .sort_values(["fraction", "unanimity", "poll_id"], kind="stable")
+    )
+    unanimity["y"] = unanimity.groupby("fraction").cumcount() + 1
+    df = df.merge(unanimity, on=["fraction", "poll_id"], how="left")
+    df[["unanimity", "y"]] = df[["unanimity", "y"]].fillna(0).astype(int)
+
+    return df
+
+
+def votes(rows: list) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=["fraction", "poll_id", "name", "vote"])
+    df["vote"] = df.vote.astype(vote_options)
+    return df
+
+
+def check(df: pd.DataFrame) -> None:
+    result = add_party_line_metrics(df)
+    expected = reference(df)
+    for column in ["party_line", "on_party_line", "n_dissent", "unanimity", "y"]:
+        assert result[column].tolist() == expected[column].tolist(), column
+
+
+def test_majorities_dissent_and_ranks():
+    check(
+        votes(
+            [
+                ("A", "1", "a", "yes"),
+                ("A", "1", "b", "yes"),
+                ("A", "1", "c", "no"),
+                ("A", "2", "a", "no"),
+                ("A", "2", "b", "no"),
+                ("A", "2", "c", "no"),
+                ("B", "1", "d", "abstain"),
+                ("B", "1", "e", "yes"),
+                ("B", "1", "f", "abstain"),
+                ("B", "2", "d", "yes"),
+            ]
+        )
+    )
+
+
+def test_ties_go_to_the_first_option():
+    df = votes(
+        [
+            ("A", "1", "a", "no"),
+            ("A", "1", "b", "yes"),
+            ("A", "2", "a", "abstain"),
+            ("A", "2", "b", "no"),
+            ("A", "3", "a", "yes"),
+            ("A", "3", "b", "yes"),
+        ]
+    )
+    check(df)
+    result = add_party_line_metrics(df)
+    assert result.party_line.tolist()[:4] == ["yes", "yes", "no", "no"]
+    # polls 1 and 2 are equally unanimous and keep the order of poll_id:
+    assert result.y.tolist() == [1, 1, 2, 2, 3, 3]
+
+
+def test_missing_names_and_votes_are_not_counted():
+    df = votes(
+        [
+            ("A", "1", "a", "yes"),
+            ("A", "1", "b", "yes"),
+            ("A", "1", None, "no"),
+            ("A", "1", "c", None),
+            ("A", "2", None, "no"),
+            ("A", "2", "a", "yes"),
+            ("A", "2", "b", "no"),
+            ("A", "3", "c", None),
+            ("B", "1", "z", "no"),
+        ]
+    )
+    check(df)
+    result = add_party_line_metrics(df)
+
+    # the unnamed dissenting vote is nobody's, not the last MdB's:
+    assert result.n_dissent[result.name.eq("z")].tolist() == [0]
+    # a poll without a valid vote has no party line:
+    assert result.party_line.isna().tolist()[-2] is True
+
+
+def test_random_votes_match_groupby():
+    rng = np.random.default_rng(0)
+    n = 2000
+    df = votes(
+        zip(
+            rng.choice(["A", "B", "C"], n),
+            rng.integers(0, 40, n).astype(str),
+            rng.choice([f"MdB {i}" for i in range(30)] + [None], n),
+            rng.choice(["yes", "no", "abstain", None], n, p=[0.5, 0.3, 0.15, 0.05]),
+        )
+    )
+    check(df)
@@ -0,0 +1,69 @@
+import datetime
+
+import numpy as np
+import pytest
+import requests
+
+from benchmarks.synthetic import SyntheticAWDE
+from bundestag.src.data.models import query_all
+from conftest import RecordingSource
+
+
+@pytest.fixture(scope="module")
+def synthetic():
+    return SyntheticAWDE(legislatures=1, polls=45, mdbs=10)
+
+
+def params():
+    # values that are not str, as callers pass them:
+    return {
+        "field_legislature[entity.id]": np.int64(100),
+        "field_poll_date[gte]": datetime.date(2000, 1, 1),
+    }
+
+
+def test_pages_come_in_order(awde, synthetic):
+    url = awde(synthetic)
+    results = query_all(url, "polls", params(), pager_limit=10, workers=4)
+
+    assert [p["id"] for p in results] == [p["id"] for p in synthetic.poll_list]
+
+
+def test_interrupted_query_resumes_from_checkpoint(awde, synthetic, tmp_path):
+    checkpoint = tmp_path / "polls"
+
+    # the query breaks off at page 3; pages 1 and 2 are kept on disk:
+    source = RecordingSource(synthetic, fail_from=3)
+    url = awde(source)
+    with pytest.raises(requests.HTTPError):
+        query_all(url, "polls", params(), pager_limit=10, checkpoint=checkpoint)
+    assert sorted(p.name for p in checkpoint.glob("page-*.json")) == [
+        "page-1.json",
+        "page-2.json",
+    ]
+
+    source.fail_from = None
+    source.requested = []
+    results = query_all(url, "polls", params(), pager_limit=10, checkpoint=checkpoint)
+
+    assert [p["id"] for p in results] == [p["id"] for p in synthetic.poll_list]
+    assert source.requested == [("polls", 0), ("polls", 3), ("polls", 4)]
+    assert not checkpoint.exists()
+
+
+def test_checkpoint_of_another_total_is_discarded(awde, synthetic, tmp_path):
+    checkpoint = tmp_path / "polls"
+
+    url = awde(RecordingSource(synthetic, fail_from=2))
+    with pytest.raises(requests.HTTPError):
+        query_all(url, "polls", params(), pager_limit=10, checkpoint=checkpoint)
+    assert (checkpoint / "page-1.json").exists()
+
+    # AWDE has published more polls since:
+    more = SyntheticAWDE(legislatures=1, polls=52, mdbs=10)
+    source = RecordingSource(more)
+    url = awde(source)
+    results = query_all(url, "polls", params(), pager_limit=10, checkpoint=checkpoint)
+
+    assert [p["id"] for p in results] == [p["id"] for p in more.poll_list]
+    assert source.requested == [("polls", page) for page in range(6)]
@@ -0,0 +1,107 @@
+import json
+import multiprocessing
+
+import pandas as pd
+
+from bundestag.src.data.models import RawStore
+
+
+def votes(poll: int, n: int = 3) -> pd.DataFrame:
+    return pd.DataFrame({"id": range(poll * 10, poll * 10 + n), "vote": ["yes"] * n})
+
+
+def test_pending_datasets_are_readable_before_flush(tmp_path):
+    store = RawStore(tmp_path)
+    store.append("votes_1", votes(1))
+
+    assert "votes_1" in store
+    assert store.num_rows("votes_1") == 3
+    assert not (tmp_path / "index.json").exists()
+
+
+def test_flush_writes_one_segment_with_a_row_group_per_dataset(tmp_path):
+    store = RawStore(tmp_path)
+    for poll in [1, 2, 3]:
+        store.append(f"votes_{poll}", votes(poll, n=poll))
+    store.flush()
+
+    assert len(list(tmp_path.glob("segment-*.parquet"))) == 1
+    index = json.loads((tmp_path / "index.json").read_text())
+    assert sorted(row_group for _, row_group in index.values()) == [0, 1, 2]
+
+    reopened = RawStore(tmp_path)
+    assert len(reopened) == 3
+    assert reopened.num_rows("votes_2") == 2
+    assert reopened.read("votes_3").id.tolist() == [30, 31, 32]
+    assert reopened.read("votes_4") is None
+
+
+def test_read_many_splits_row_groups_of_several_segments(tmp_path):
+    store = RawStore(tmp_path)
+    store.append("votes_1", votes(1, n=2))
+    store.append("votes_2", votes(2, n=4))
+    store.flush()
+    store.append("votes_3", votes(3, n=1))
+    store.flush()
+    store.append("votes_4", votes(4, n=2))
+
+    out = RawStore(tmp_path).read_many(["votes_3", "votes_1", "votes_2", "votes_9"])
+    assert set(out) == {"votes_1", "votes_2", "votes_3"}
+    for name, df in out.items():
+        poll = int(name.split("_")[1])
+        assert df.id.tolist() == votes(poll, n=len(df)).id.tolist()
+        assert df.index.equals(pd.RangeIndex(len(df)))
+    assert len(out["votes_2"]) == 4
+
+    assert store.read_many(["votes_4"])["votes_4"].id.tolist() == [40, 41]
+
+
+def test_segments_unify_differing_types(tmp_path):
+    store = RawStore(tmp_path)
+    store.append("votes_1", votes(1).assign(reason=None))
+    store.append("votes_2", votes(2).assign(reason="Sonstiges"))
+    store.flush()
+
+    assert RawStore(tmp_path).read("votes_2").reason.tolist() == ["Sonstiges"] * 3
+
+
+def test_compact_merges_segments_and_loose_files(tmp_path):
+    store = RawStore(tmp_path / "votes")
+    for poll in [1, 2]:
+        store.append(f"votes_{poll}", votes(poll))
+        store.flush()
+    loose = tmp_path / "votes_3.parquet"
+    votes(3).to_parquet(loose)
+
+    store.compact([loose])
+
+    assert len(list((tmp_path / "votes").glob("segment-*.parquet"))) == 1
+    assert not loose.exists()
+    reopened = RawStore(tmp_path / "votes")
+    assert len(reopened) == 3
+    for poll in [1, 2, 3]:
+        assert reopened.read(f"votes_{poll}").id.tolist() == votes(poll).id.tolist()
+
+
+def _write(directory, polls):
+    store = RawStore(directory)
+    for poll in polls:
+        store.append(f"votes_{poll}", votes(poll))
+        store.flush()
+
+
+def test_concurrent_processes_keep_all_index_entries(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_write, args=(tmp_path, range(i, 40, 4)))
+        for i in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    store = RawStore(tmp_path)
+    assert len(store) == 40
+    assert store.read("votes_17").id.tolist() == votes(17).id.tolist()
@@ -0,0 +1,66 @@
+import pytest
+import requests
+
+from benchmarks.synthetic import SyntheticAWDE
+from bundestag.src.data.ensure_data import (
+    _fetch_votes,
+    get_polls,
+    get_votes,
+    recheck_legislature,
+)
+
+
+class CorrectedSource:
+    """
+    Wraps a source of the AWDE stand-in: the votes of polls in `corrected` come
+    with the first vote changed, as AWDE corrects them, and those of polls in
+    `missing` are not found (404).
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.corrected = set()
+        self.missing = set()
+
+    def page(self, endpoint: str, params: dict) -> dict:
+        response = self.source.page(endpoint, params)
+        if endpoint == "votes":
+            poll = int(params["poll"])
+            if poll in self.missing:
+                return None
+            if poll in self.corrected and response["data"]:
+                first = response["data"][0]
+                vote = "no" if first["vote"] == "yes" else "yes"
+                response["data"] = [{**first, "vote": vote}, *response["data"][1:]]
+        return response
+
+
+@pytest.fixture
+def source(default_awde):
+    source = CorrectedSource(SyntheticAWDE(legislatures=1, polls=4, mdbs=10))
+    default_awde(source)
+    return source
+
+
+def first_vote(poll: int) -> str:
+    return get_votes(poll=poll, fetch=False).rawdata.vote.iloc[0]
+
+
+def test_interrupted_recheck_is_repeated(source):
+    legislature = source.source.parliament_periods[0]["id"]
+    poll_ids = get_polls(legislature=legislature).data.id.tolist()
+    _fetch_votes(poll_ids)
+    before = first_vote(poll_ids[0])
+
+    # the votes of one poll are corrected, but those of another cannot be had:
+    source.corrected.add(poll_ids[0])
+    source.missing.add(poll_ids[1])
+    with pytest.raises(requests.HTTPError):
+        recheck_legislature(legislature)
+
+    # the correction was not saved, and is found again next time:
+    source.missing.clear()
+    assert recheck_legislature(legislature)
+    assert first_vote(poll_ids[0]) != before
+
+    assert not recheck_legislature(legislature)
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic import SyntheticAWDE
+from bundestag.src.data.models import ResponseCache, query_all
+from conftest import RecordingSource
+
+
+class EditableSource(RecordingSource):
+    """
+    A RecordingSource whose poll labels can be changed, as AWDE corrects them.
+    """
+
+    def __init__(self, source):
+        super().__init__(source)
+        self.labels = {}
+
+    def page(self, endpoint: str, params: dict) -> dict:
+        response = super().page(endpoint, params)
+        response["data"] = [
+            (
+                {**poll, "label": self.labels[poll["id"]]}
+                if poll["id"] in self.labels
+                else poll
+            )
+            for poll in response["data"]
+        ]
+        return response
+
+
+@pytest.fixture
+def source():
+    return EditableSource(SyntheticAWDE(legislatures=1, polls=35, mdbs=10))
+
+
+def query(url, cache, if_modified=False):
+    return query_all(
+        url, "polls", {}, pager_limit=10, cache=cache, if_modified=if_modified
+    )
+
+
+def test_unchanged_pages_are_not_modified(awde, source, tmp_path):
+    url = awde(source)
+    cache = ResponseCache(tmp_path / "http_cache.json")
+    assert len(query(url, cache)) == 35
+
+    awde.stats.clear()
+    assert query(url, cache, if_modified=True) is None
+    assert awde.stats == {"requests": 4, 304: 4}
+
+
+def test_a_changed_page_returns_all_results(awde, source, tmp_path):
+    url = awde(source)
+    cache = ResponseCache(tmp_path / "http_cache.json")
+    query(url, cache)
+
+    # a poll on page 2 is corrected:
+    poll = source.source.poll_list[25]
+    source.labels[poll["id"]] = "Corrected"
+    source.requested = []
+
+    results = query(url, cache, if_modified=True)
+    assert [p["id"] for p in results] == [p["id"] for p in source.source.poll_list]
+    assert results[25]["label"] == "Corrected"
+    # revalidated all pages, then fetched those that had not changed again:
+    assert sorted(source.requested) == sorted(
+        [("polls", p) for p in [0, 1, 2, 3, 0, 1, 3]]
+    )
+
+    # the validators are updated; now nothing has changed:
+    assert query(url, cache, if_modified=True) is None
+
+
+def test_validators_survive_the_process_and_merge(awde, source, tmp_path):
+    url = awde(source)
+    path = tmp_path / "http_cache.json"
+
+    first = ResponseCache(path)
+    second = ResponseCache(path)
+    query(url, first)
+    query_all(url, "parliament-periods", {}, cache=second)
+    first.flush()
+    second.flush()
+
+    entries = json.loads(path.read_text())
+    assert len(entries) == 5
+    assert all("etag" in entry and "result" in entry for entry in entries.values())
+
+    assert query(url, ResponseCache(path), if_modified=True) is None
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bundestag.src.data.ensure_data import add_party_line_metrics, vote_options
+from bundestag.src.viz.selection_index import SelectionIndex
+from bundestag.src.viz.visualize import get_fig_dissenters, get_fig_votes
+
+
+@pytest.fixture(scope="module")
+def data() -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    rows = []
+    vote_id = 0
+    for legislature in [1, 2]:
+        for fraction, n_mdbs in [("A", 12), ("B", 8)]:
+            for poll in range(15):
+                line = rng.choice(["yes", "no", "abstain"])
+                for mdb in range(n_mdbs):
+                    vote = line
+                    if rng.random() < 0.15:
+                        vote = rng.choice(["yes", "no", "abstain"])
+                    vote_id += 1
+                    rows.append(
+                        (
+                            legislature,
+                            fraction,
+                            str(poll),
+                            f"{fraction}{mdb}",
+                            vote,
+                            vote_id,
+                            f"Poll {poll}",
+                            rng.choice(["yes", "no"]),
+                        )
+                    )
+    df = pd.DataFrame(
+        rows,
+        columns=[
+            "fid_legislatur",
+            "fraction",
+            "poll_id",
+            "name",
+            "vote",
+            "vote_id",
+            "label",
+            "parliament_vote",
+        ],
+    )
+    df["vote"] = df.vote.astype(vote_options)
+    df["date"] = "2021-01-01"
+    return add_party_line_metrics(df)
+
+
+def plot_data(data, legislature, fraction):
+    return data.loc[data.fid_legislatur.eq(legislature) & data.fraction.eq(fraction)]
+
+
+def test_resolve_returns_the_votes_drawn_at_the_points(data):
+    index = SelectionIndex(data)
+    votes = plot_data(data, 2, "A").set_index("vote_id")
+
+    fig = get_fig_dissenters(plot_data(data, 2, "A"))
+    points = [{"curveNumber": 0, "pointIndex": i} for i in range(len(fig.data[0].x))]
+    vote_ids = index.resolve(2, "A", "dissenters", points)
+
+    assert len(vote_ids) == (~votes.on_party_line).sum()
+    assert not votes.loc[vote_ids].on_party_line.any()
+    names = [fig.layout.yaxis.ticktext[y] for y in fig.data[0].y]
+    assert votes.loc[vote_ids].name.tolist() == names
+
+    fig = get_fig_votes(plot_data(data, 2, "A"))
+    points = [
+        {"curveNumber": curve, "pointIndex": i}
+        for curve, trace in enumerate(fig.data)
+        for i in range(len(trace.y))
+    ]
+    vote_ids_votes = index.resolve(2, "A", "votes", points)
+
+    # the fraction majority bars and poll results stand for no single vote:
+    assert sorted(vote_ids_votes) == sorted(vote_ids)
+    polls_y = [
+        y
+        for trace in fig.data
+        if trace.meta and "name" in trace.meta["fields"]
+        for y in trace.y
+    ]
+    assert votes.loc[vote_ids_votes].y.tolist() == polls_y
+
+
+def test_selectedpoints_round_trip(data):
+    index = SelectionIndex(data)
+    points = [{"curveNumber": 0, "pointIndex": i} for i in [0, 3, 5]]
+    vote_ids = index.resolve(1, "B", "dissenters", points)
+
+    votes_points, diss_points = index.selectedpoints(1, "B", vote_ids)
+    assert diss_points == {0: [0, 3, 5]}
+
+    back = index.resolve(
+        1,
+        "B",
+        "votes",
+        [
+            {"curveNumber": trace, "pointIndex": i}
+            for trace, rows in votes_points.items()
+            for i in rows
+        ],
+    )
+    assert sorted(back) == sorted(vote_ids)
+
+
+def test_nothing_selected_and_foreign_votes(data):
+    index = SelectionIndex(data)
+
+    votes_points, diss_points = index.selectedpoints(1, "A")
+    assert diss_points == {0: None}
+    assert votes_points and all(rows is None for rows in votes_points.values())
+
+    # votes of another fraction select nothing here:
+    other = plot_data(data, 1, "B")
+    votes_points, diss_points = index.selectedpoints(
+        1, "A", other.vote_id[~other.on_party_line].tolist()
+    )
+    assert diss_points == {0: []}
+    assert all(rows == [] for rows in votes_points.values())
+
+    assert index.resolve(3, "A", "votes", [{"curveNumber": 0, "pointIndex": 0}]) == []
+
+
+def test_points_beyond_the_trace_are_left_out(data):
+    index = SelectionIndex(data)
+    n_points = len(get_fig_dissenters(plot_data(data, 1, "B")).data[0].x)
+
+    points = [{"curveNumber": 0, "pointIndex": i} for i in [0, n_points, -1]]
+    assert len(index.resolve(1, "B", "dissenters", points)) == 1
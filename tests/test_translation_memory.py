@@ -0,0 +1,37 @@
+import json
+
+from bundestag.src.i18n import TranslationMemory
+
+
+def test_flush_merges_entries_of_other_processes(tmp_path):
+    path = tmp_path / "dictionary.json"
+    path.write_text(json.dumps({"Ja": {"EN-GB": "Yes"}}))
+
+    # two processes' memories, both loaded before either wrote anything:
+    first = TranslationMemory(path)
+    second = TranslationMemory(path)
+    assert first.get("Ja", "EN-GB") == second.get("Ja", "EN-GB") == "Yes"
+
+    first.add("Nein", "EN-GB", "No")
+    first.flush()
+    second.add("Enthaltung", "EN-GB", "Abstention")
+    second.add("Ja", "FR", "Oui")
+    second.flush()
+
+    assert json.loads(path.read_text()) == {
+        "Ja": {"EN-GB": "Yes", "FR": "Oui"},
+        "Nein": {"EN-GB": "No"},
+        "Enthaltung": {"EN-GB": "Abstention"},
+    }
+    # what the first wrote is known to the second now:
+    assert second.get("Nein", "EN-GB") == "No"
+    assert TranslationMemory(path).get("Enthaltung", "EN-GB") == "Abstention"
+
+
+def test_nothing_is_written_without_new_entries(tmp_path):
+    path = tmp_path / "dictionary.json"
+    memory = TranslationMemory(path)
+    assert memory.get("Ja", "EN-GB") is None
+
+    memory.flush()
+    assert not path.exists()